@@ -0,0 +1,139 @@
+"""
+Latency-adaptive MediaPipe model_complexity selection.
+
+Keeps one Pose instance per complexity level and picks a level per session
+from the measured per-frame latency (against a target budget) and the
+landmark confidence (mean visibility): sessions are downgraded when they
+run over budget and upgraded when confidence drops while the heavier
+model still fits the budget. Only the model's own processing time counts
+as latency; time spent waiting for a level's shared Pose instance is
+reported separately, so contention doesn't push every session down.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from pose_pipeline import create_pose
+
+EWMA_ALPHA = 0.2
+MAX_SESSIONS = 1024
+
+
+class _SessionState:
+    __slots__ = ("level", "latency_ms", "confidence", "frames_since_switch")
+
+    def __init__(self, level):
+        self.level = level
+        self.latency_ms = None
+        self.confidence = None
+        self.frames_since_switch = 0
+
+
+def _ewma(previous, value):
+    return value if previous is None else previous + EWMA_ALPHA * (value - previous)
+
+
+class AdaptivePoseSelector:
+    def __init__(self, levels=(0, 1, 2), default_level=1, latency_budget_ms=80.0,
+                 low_confidence=0.6, cooldown_frames=10):
+        self.levels = sorted(levels)
+        self.default_level = default_level
+        self.latency_budget_ms = latency_budget_ms
+        self.low_confidence = low_confidence
+        self.cooldown_frames = cooldown_frames
+
+        self._poses = {level: create_pose(model_complexity=level) for level in self.levels}
+        # A Pose graph is not thread safe; one lock per instance
+        self._pose_locks = {level: threading.Lock() for level in self.levels}
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._level_latency_ms = {level: None for level in self.levels}
+        self._level_wait_ms = {level: None for level in self.levels}
+        self._frames = {level: 0 for level in self.levels}
+        self._switches = {"upgrades": 0, "downgrades": 0}
+        self._recent_switches = []
+
+    def process(self, session_id, frame_rgb):
+        """Run pose.process at the session's current level; returns (results, level)"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = self._sessions[session_id] = _SessionState(self.default_level)
+                if len(self._sessions) > MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            level = state.level
+
+        waited = time.perf_counter()
+        with self._pose_locks[level]:
+            started = time.perf_counter()
+            results = self._poses[level].process(frame_rgb)
+            finished = time.perf_counter()
+        wait_ms = (started - waited) * 1000.0
+        latency_ms = (finished - started) * 1000.0
+
+        if results.pose_landmarks:
+            confidence = float(np.mean([lm.visibility for lm in results.pose_landmarks.landmark]))
+        else:
+            confidence = 0.0
+
+        with self._lock:
+            self._level_wait_ms[level] = _ewma(self._level_wait_ms[level], wait_ms)
+            self._observe(state, level, latency_ms, confidence)
+        return results, level
+
+    def _observe(self, state, level, latency_ms, confidence):
+        self._frames[level] += 1
+        self._level_latency_ms[level] = _ewma(self._level_latency_ms[level], latency_ms)
+        state.latency_ms = _ewma(state.latency_ms, latency_ms)
+        state.confidence = _ewma(state.confidence, confidence)
+        state.frames_since_switch += 1
+        if state.frames_since_switch < self.cooldown_frames:
+            return
+
+        idx = self.levels.index(state.level)
+        if state.latency_ms > self.latency_budget_ms and idx > 0:
+            self._switch(state, self.levels[idx - 1], "downgrades")
+        elif state.confidence < self.low_confidence and idx < len(self.levels) - 1:
+            heavier = self.levels[idx + 1]
+            # Scale the session's current latency by the relative cost of the
+            # heavier model, so a stale measurement taken under load does not
+            # block upgrades forever
+            heavier_ms = self._level_latency_ms[heavier]
+            current_ms = self._level_latency_ms[state.level]
+            expected_ms = None if heavier_ms is None else state.latency_ms * heavier_ms / current_ms
+            if expected_ms is None or expected_ms <= self.latency_budget_ms:
+                self._switch(state, heavier, "upgrades")
+
+    def _switch(self, state, level, kind):
+        self._switches[kind] += 1
+        # Public metrics: no session ids
+        self._recent_switches.append({
+            "from": state.level, "to": level, "time": time.time(),
+            "latency_ms": round(state.latency_ms, 2), "confidence": round(state.confidence, 3),
+        })
+        del self._recent_switches[:-50]
+        state.level = level
+        state.latency_ms = None
+        state.frames_since_switch = 0
+
+    def metrics(self):
+        with self._lock:
+            sessions_per_level = {level: 0 for level in self.levels}
+            for state in self._sessions.values():
+                sessions_per_level[state.level] += 1
+            return {
+                "latency_budget_ms": self.latency_budget_ms,
+                "switches": dict(self._switches),
+                "recent_switches": list(self._recent_switches),
+                "frames_per_level": dict(self._frames),
+                "sessions_per_level": sessions_per_level,
+                "latency_ms_per_level": {level: None if ms is None else round(ms, 2)
+                                         for level, ms in self._level_latency_ms.items()},
+                "lock_wait_ms_per_level": {level: None if ms is None else round(ms, 2)
+                                           for level, ms in self._level_wait_ms.items()},
+            }
@@ -0,0 +1,168 @@
+"""
+Admission control for the predict path.
+
+Requests take a service slot from a FairScheduler before touching the
+MediaPipe trackers (one per slot). Waiting requests are queued per session and
+slots are handed out round-robin across sessions, so one fast poller
+cannot starve the others. The queue is bounded and requests whose
+expected wait exceeds the budget are rejected up front (the caller turns
+that into 503 + Retry-After), and every response carries a recommended
+polling interval that keeps the aggregate request rate near capacity.
+Service time is tracked per frame, so a batch request holding its slot
+for many frames doesn't inflate the estimate for single-frame requests.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+EWMA_ALPHA = 0.2
+ACTIVE_SESSION_WINDOW_S = 5.0
+
+
+class Rejected(Exception):
+    """Raised when a request is shed; retry_after is in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("granted",)
+
+    def __init__(self):
+        self.granted = False
+
+
+class FairScheduler:
+    def __init__(self, capacity=1, max_queue=64, max_per_session=2,
+                 wait_budget_s=1.0, min_poll_interval_ms=200):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.wait_budget_s = wait_budget_s
+        self.min_poll_interval_ms = min_poll_interval_ms
+
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # session -> deque of waiting tickets, in round-robin order
+        self._queued = 0
+        self._in_service = 0
+        self._service_s = None
+        self._last_seen = {}
+        self._stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_session_full": 0,
+                       "rejected_wait_budget": 0, "timed_out": 0}
+
+    @contextmanager
+    def slot(self, session_id, frames=1):
+        """Hold a service slot for the duration of the block; raises Rejected when shed"""
+        self._acquire(session_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release((time.monotonic() - started) / max(1, frames))
+
+    def _acquire(self, session_id):
+        with self._cond:
+            now = time.monotonic()
+            self._last_seen[session_id] = now
+
+            if self._in_service < self.capacity and not self._queued:
+                self._in_service += 1
+                self._stats["admitted"] += 1
+                return
+
+            queue = self._queues.get(session_id)
+            if queue is not None and len(queue) >= self.max_per_session:
+                self._reject("rejected_session_full", "Too many pending requests for this session")
+            if self._queued >= self.max_queue:
+                self._reject("rejected_queue_full", "Server queue is full")
+            if self._estimated_wait(session_id) > self.wait_budget_s:
+                self._reject("rejected_wait_budget", "Expected queue wait exceeds budget")
+
+            ticket = _Ticket()
+            if queue is None:
+                queue = self._queues[session_id] = deque()
+            queue.append(ticket)
+            self._queued += 1
+
+            deadline = now + self.wait_budget_s
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.remove(ticket)
+                    self._queued -= 1
+                    if not queue and self._queues.get(session_id) is queue:
+                        del self._queues[session_id]
+                    self._reject("timed_out", "Queue wait exceeded budget")
+                self._cond.wait(remaining)
+            self._stats["admitted"] += 1
+
+    def _release(self, frame_service_s):
+        with self._cond:
+            self._in_service -= 1
+            if self._service_s is None:
+                self._service_s = frame_service_s
+            else:
+                self._service_s += EWMA_ALPHA * (frame_service_s - self._service_s)
+            self._grant_next()
+
+    def _grant_next(self):
+        # Called with the lock held: serve the head of the next session in turn
+        while self._in_service < self.capacity and self._queues:
+            session_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            ticket.granted = True
+            self._in_service += 1
+        self._cond.notify_all()
+
+    def _estimated_wait(self, session_id):
+        """Expected wait (s) for a new ticket of this session under round-robin service"""
+        if self._service_s is None:
+            return 0.0
+        own = self._queues.get(session_id)
+        position = len(own) if own else 0
+        # Every other session gets up to position + 1 turns before this ticket is served
+        ahead = position + sum(min(len(q), position + 1)
+                               for sid, q in self._queues.items() if sid != session_id)
+        return (ahead + 1) * self._service_s / self.capacity
+
+    def _reject(self, kind, reason):
+        self._stats[kind] += 1
+        retry_after = max(1, math.ceil(self._estimated_wait(None) or self.wait_budget_s))
+        raise Rejected(reason, retry_after)
+
+    def _active_sessions(self, now):
+        cutoff = now - ACTIVE_SESSION_WINDOW_S
+        for session_id in [sid for sid, seen in self._last_seen.items() if seen < cutoff]:
+            del self._last_seen[session_id]
+        return max(1, len(self._last_seen))
+
+    def poll_interval_ms(self):
+        """Polling interval that spreads the current service capacity over the active sessions"""
+        with self._cond:
+            if self._service_s is None:
+                return self.min_poll_interval_ms
+            active = self._active_sessions(time.monotonic())
+            interval = self._service_s * 1000.0 * active / self.capacity
+            return int(max(self.min_poll_interval_ms, interval))
+
+    def metrics(self):
+        with self._cond:
+            return {
+                **self._stats,
+                "queued": self._queued,
+                "in_service": self._in_service,
+                "capacity": self.capacity,
+                "service_ms": None if self._service_s is None else round(self._service_s * 1000.0, 2),
+                "active_sessions": self._active_sessions(time.monotonic()),
+            }
@@ -3,35 +3,117 @@ Flask API server for Suryanamaskara Pose Detection
 Serves predictions from the trained model to the Next.js frontend
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response, send_file
 from flask_cors import CORS
 import cv2
-import mediapipe as mp
 import numpy as np
-import joblib
-import base64
 import os
+import sys
+import json
+import hmac
+import math
+import secrets
+import subprocess
+import tempfile
+import threading
+import uuid
+import time
+import functools
+import atexit
+import queue
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from pose_pipeline import (
+    HERE,
+    decode_image, create_pose, landmarks_to_array, parse_landmarks, model_features,
+    classify, calculate_angles, build_prediction, normalize_pose_name
+)
+from landmark_trace import TraceWriter
+from adaptive_pose import AdaptivePoseSelector
+from admission import FairScheduler, Rejected
+from cascade_classifier import CASCADE_PATH, CascadeClassifier, wrap_forest
+from model_reload import ModelReloader
+from request_profiler import RequestProfiler
+from session_history import SessionHistory
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)  # Enable CORS for Next.js frontend
-
-# Get the directory where this script is located
-HERE = os.path.dirname(os.path.abspath(__file__))
-
-# Load trained model and reference keypoints
-model = joblib.load(os.path.join(HERE, 'pose_classifier_rf.pkl'))
-reference_keypoints = joblib.load(os.path.join(HERE, 'reference_keypoints.pkl'))
-
-# Initialize MediaPipe Pose
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=1,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
+CORS(app, expose_headers=['X-Poll-Interval-Ms', 'Retry-After'])  # Enable CORS for Next.js frontend
+# Largest accepted request body (video uploads, image batches)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('POSE_MAX_UPLOAD_MB', 200)) * 1024 * 1024
+
+# Optional cascade: geometric stage first, forest only for ambiguous frames (POSE_CASCADE=1).
+# Every loaded forest is re-checked against the stage; a mismatch serves the bare forest.
+wrap_model = None
+if os.environ.get('POSE_CASCADE') == '1':
+    wrap_model = lambda forest: wrap_forest(forest, CASCADE_PATH)
+
+# Load the current model version and reference keypoints; new versions registered
+# by train_pose_model.py / update_pose_model.py are warmed and swapped in live
+models = ModelReloader(
+    wrap=wrap_model,
+    poll_interval_s=float(os.environ.get('POSE_MODEL_POLL_S', 2)),
+    min_reference_agreement=float(os.environ.get('POSE_MIN_REFERENCE_AGREEMENT', 0.5))
+)
+if os.environ.get('POSE_MODEL_RELOAD', '1') == '1':
+    models.start()
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get('POSE_ADMIN_TOKEN')
+
+# Signs the tokens handed out by POST /api/sessions; a random key means tokens
+# only survive until the server restarts
+SESSION_SECRET = os.environ.get('POSE_SESSION_SECRET', '').encode() or secrets.token_bytes(32)
+
+# On-demand cProfile captures of /api/predict, started via /api/admin/profile
+profiler = RequestProfiler(os.environ.get('POSE_PROFILE_DIR', os.path.join(HERE, 'profiles')))
+MAX_PROFILE_SECONDS = 600
+
+# Optional per-session model_complexity switching (POSE_ADAPTIVE_COMPLEXITY=1)
+adaptive_pose = None
+if os.environ.get('POSE_ADAPTIVE_COMPLEXITY') == '1':
+    adaptive_pose = AdaptivePoseSelector(
+        latency_budget_ms=float(os.environ.get('POSE_LATENCY_BUDGET_MS', 80)),
+        low_confidence=float(os.environ.get('POSE_LOW_CONFIDENCE', 0.6))
+    )
+
+# Fair per-session admission to the MediaPipe trackers, with load shedding
+MAX_CONCURRENCY = int(os.environ.get('POSE_MAX_CONCURRENCY', 1))
+scheduler = FairScheduler(
+    capacity=MAX_CONCURRENCY,
+    max_queue=int(os.environ.get('POSE_MAX_QUEUE', 64)),
+    max_per_session=int(os.environ.get('POSE_MAX_PER_SESSION', 2)),
+    wait_budget_s=float(os.environ.get('POSE_QUEUE_BUDGET_MS', 1000)) / 1000.0
 )
 
+# Initialize MediaPipe Pose: MediaPipe graphs are not thread-safe, so every
+# scheduler slot gets its own tracker (unused in adaptive mode, which locks its own)
+pose_trackers = [] if adaptive_pose else [create_pose(model_complexity=1) for _ in range(MAX_CONCURRENCY)]
+pose_pool = queue.Queue()
+for tracker in pose_trackers:
+    pose_pool.put(tracker)
+
+# Optional landmark trace of every processed frame, for camera-free replay
+TRACE_PATH = os.environ.get('POSE_TRACE_PATH')
+trace_writer = TraceWriter(TRACE_PATH) if TRACE_PATH else None
+if trace_writer:
+    # Flush buffered frames at shutdown
+    atexit.register(trace_writer.close)
+
+# Optional per-session history (hold segments in SQLite, written by a background thread)
+HISTORY_DB = os.environ.get('POSE_HISTORY_DB')
+history = SessionHistory(HISTORY_DB) if HISTORY_DB else None
+if history:
+    # Write segments still open at shutdown
+    atexit.register(history.close)
+
+# cv2.imdecode releases the GIL, so batch frames are decoded in parallel
+decode_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+MAX_BATCH_FRAMES = 64
+# Longest capture span accepted for one batch's "timestamps" (catches milliseconds sent as seconds)
+MAX_BATCH_SPAN_S = 60.0
+
 # Pose order for Suryanamaskara
 POSE_ORDER = [
     "Pranamasana",
@@ -48,204 +130,125 @@ POSE_ORDER = [
     "Pranamasana"
 ]
 
-# Angle-based corrections dictionary (from correc.py)
-POSE_CORRECTIONS_ANGLES = {
-    "pranamasana": {
-        "elbow_angle": (170, 190, "Keep arms straight together"),
-    },
-    "hasta_utthanasana": {
-        "elbow_angle": (170, 190, "Arms straight up"),
-        "back_angle": (190, 230, "Arch back slightly"),
-    },
-    "padahastasana": {
-        "hip_angle": (50, 100, "Bend forward fully"),
-    },
-    "ashwa_sanchalanasana": {
-        "front_knee": (80, 100, "Bend front knee to ~90°"),
-        "back_leg": (160, 190, "Keep back leg straight"),
-    },
-    "kumbhakasana": {
-        "body_line": (160, 180, "Keep body straight like plank"),
-    },
-    "ashtanga_namaskara": {
-        "elbow_angle": (80, 110, "Bend elbows ~90°"),
-    },
-    "bhujangasana": {
-        "back_angle": (90, 120, "Lift chest higher"),
-        "elbow_angle": (160, 190, "Keep arms straight"),
-    },
-    "adho_mukh_svanasana": {
-        "hip_angle": (70, 110, "Push hips up to form inverted V"),
-    },
-}
-
-# Basic descriptions for fallback
-POSE_CORRECTIONS = {
-    "Pranamasana": {
-        "description": "Prayer Pose - Stand with palms together at chest",
-        "corrections": [
-            "Keep your palms together at chest level",
-            "Stand straight with feet together",
-            "Relax your shoulders"
-        ]
-    },
-    "Hasta Utthanasana": {
-        "description": "Raised Arms - Arms up, arch back slightly",
-        "corrections": [
-            "Raise arms straight up",
-            "Arch your back slightly",
-            "Look up at your hands"
-        ]
-    },
-    "Padahastasana": {
-        "description": "Forward Bend - Touch toes, bend forward",
-        "corrections": [
-            "Bend forward from the hips",
-            "Try to touch your toes",
-            "Keep your legs straight"
-        ]
-    },
-    "Ashwa Sanchalanasana": {
-        "description": "Lunge - One leg back, knee down",
-        "corrections": [
-            "Step one leg back",
-            "Keep front knee at 90 degrees",
-            "Look up and arch your back"
-        ]
-    },
-    "Kumbhakasana": {
-        "description": "Plank - Straight body like a plank",
-        "corrections": [
-            "Keep body straight like a plank",
-            "Don't let hips sag",
-            "Engage your core"
-        ]
-    },
-    "Ashtanga Namaskara": {
-        "description": "Eight Point Pose - Chest and knees down",
-        "corrections": [
-            "Lower chest and knees to ground",
-            "Keep hips raised",
-            "Chin should touch the ground"
-        ]
-    },
-    "Bhujangasana": {
-        "description": "Cobra - Chest up, arms straight",
-        "corrections": [
-            "Lift chest up",
-            "Keep elbows slightly bent",
-            "Look upward"
-        ]
-    },
-    "Adho Mukh Svanasana": {
-        "description": "Downward Dog - Inverted V shape",
-        "corrections": [
-            "Form an inverted V shape",
-            "Push hips up and back",
-            "Keep heels down"
-        ]
-    }
-}
-
-def extract_features(landmarks):
-    """Extract features from MediaPipe landmarks for model prediction"""
-    if landmarks is None:
-        return None
-    
-    features = []
-    for landmark in landmarks.landmark:
-        features.extend([landmark.x, landmark.y, landmark.z, landmark.visibility])
-    
-    return np.array(features).reshape(1, -1)
 
-def calculate_angle(a, b, c):
-    """Calculate angle between three points (from correc.py)"""
-    a = np.array([a.x, a.y])
-    b = np.array([b.x, b.y])
-    c = np.array([c.x, c.y])
-    
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    
-    if angle > 180.0:
-        angle = 360 - angle
-    
-    return angle
+def session_id():
+    """Session key: X-Session-Id header, "session_id" in the JSON body, or the client address"""
+    sid = request.headers.get('X-Session-Id')
+    if not sid and request.is_json:
+        sid = (request.get_json(silent=True) or {}).get('session_id')
+    return sid or request.remote_addr
+
+@contextmanager
+def pose_tracker():
+    """Borrow a tracker from the pool for the block (None in adaptive mode)"""
+    if adaptive_pose:
+        yield None
+        return
+    tracker = pose_pool.get()
+    try:
+        yield tracker
+    finally:
+        pose_pool.put(tracker)
+
+def process_frame(frame_rgb, sid, tracker):
+    """Run MediaPipe on one RGB frame; returns (results, model_complexity)"""
+    if adaptive_pose:
+        return adaptive_pose.process(sid, frame_rgb)
+    return tracker.process(frame_rgb), 1
+
 
-def check_pose_corrections(pose_name, landmarks):
+def request_frames():
+    """Frames in the request: the length of a batch's "images", otherwise 1"""
+    data = request.get_json(silent=True)
+    images = data.get('images') if isinstance(data, dict) else None
+    return min(len(images), MAX_BATCH_FRAMES) if isinstance(images, list) and images else 1
+
+def admission_controlled(view):
     """
-    Check angle-based corrections for a pose (from correc.py)
-    Returns list of correction feedback messages
+    Run the view inside a fair-scheduler slot. Shed requests get 503 with
+    Retry-After; every response carries X-Poll-Interval-Ms.
     """
-    pose_name_norm = pose_name.lower().replace(" ", "_")
-    
-    if pose_name_norm not in POSE_CORRECTIONS_ANGLES:
-        return []
-    
-    feedback = []
-    lm = landmarks.landmark
-    
-    for check, (low, high, message) in POSE_CORRECTIONS_ANGLES[pose_name_norm].items():
-        angle = None
-        
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
         try:
-            if check == "elbow_angle":
-                angle = calculate_angle(
-                    lm[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-                    lm[mp_pose.PoseLandmark.LEFT_ELBOW.value],
-                    lm[mp_pose.PoseLandmark.LEFT_WRIST.value]
-                )
-            elif check == "front_knee":
-                angle = calculate_angle(
-                    lm[mp_pose.PoseLandmark.LEFT_HIP.value],
-                    lm[mp_pose.PoseLandmark.LEFT_KNEE.value],
-                    lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-                )
-            elif check == "hip_angle":
-                angle = calculate_angle(
-                    lm[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-                    lm[mp_pose.PoseLandmark.LEFT_HIP.value],
-                    lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-                )
-            elif check == "back_angle":
-                angle = calculate_angle(
-                    lm[mp_pose.PoseLandmark.LEFT_HIP.value],
-                    lm[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-                    lm[mp_pose.PoseLandmark.LEFT_WRIST.value]
-                )
-            elif check == "body_line":
-                angle = calculate_angle(
-                    lm[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-                    lm[mp_pose.PoseLandmark.LEFT_HIP.value],
-                    lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-                )
-            elif check == "back_leg":
-                angle = calculate_angle(
-                    lm[mp_pose.PoseLandmark.LEFT_HIP.value],
-                    lm[mp_pose.PoseLandmark.LEFT_KNEE.value],
-                    lm[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-                )
-            
-            if angle is not None:
-                if not (low <= angle <= high):
-                    feedback.append(f"{message} (angle: {int(angle)}°)")
-        except Exception as e:
-            print(f"Error calculating {check}: {e}")
-            continue
-    
-    return feedback
+            with scheduler.slot(session_id(), frames=request_frames()):
+                response = make_response(view(*args, **kwargs))
+        except Rejected as e:
+            response = make_response(jsonify({
+                'success': False,
+                'message': f'Server busy: {e.reason}',
+                'pose': None,
+                'retry_after': e.retry_after
+            }), 503)
+            response.headers['Retry-After'] = str(e.retry_after)
+        response.headers['X-Poll-Interval-Ms'] = str(scheduler.poll_interval_ms())
+        return response
+    return wrapper
+
+
+def profiled(view):
+    """Run the view under the request profiler; a no-op unless a capture is running"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with profiler.request():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def is_admin():
+    """Whether the request carries "Authorization: Bearer <POSE_ADMIN_TOKEN>" (never when unset)"""
+    supplied = request.headers.get('Authorization', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied.encode(), f'Bearer {ADMIN_TOKEN}'.encode())
+
+
+def admin_required(view):
+    """Require an "Authorization: Bearer <POSE_ADMIN_TOKEN>" header"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'success': False, 'message': 'Admin endpoints are disabled'}), 403
+        if not is_admin():
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+        return view(*args, **kwargs)
+    return wrapper
 
 
+def session_token(sid):
+    """Server-signed proof of owning a session id issued by POST /api/sessions"""
+    return hmac.new(SESSION_SECRET, sid.encode(), 'sha256').hexdigest()
+
+
+def own_session_required(view):
+    """
+    Only the session's owner (X-Session-Token from POST /api/sessions) or an
+    admin may read /api/sessions/<sid>/...
+    """
+    @functools.wraps(view)
+    def wrapper(sid, *args, **kwargs):
+        supplied = request.headers.get('X-Session-Token', '')
+        if not hmac.compare_digest(supplied.encode(), session_token(sid).encode()) and not is_admin():
+            return jsonify({'success': False, 'message': 'Forbidden'}), 403
+        return view(sid, *args, **kwargs)
+    return wrapper
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'success': False, 'message': 'Request body too large'}), 413
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'ok',
-        'model_loaded': model is not None,
-        'mediapipe_ready': pose is not None
+        'model_loaded': models.model is not None,
+        'model_version': models.version,
+        'mediapipe_ready': bool(adaptive_pose or pose_trackers)
     })
 
 @app.route('/api/predict', methods=['POST'])
+@admission_controlled
+@profiled
 def predict_pose():
     """
     Predict pose from image frame
@@ -253,17 +256,9 @@ def predict_pose():
     Returns: { "pose": "Pranamasana", "confidence": 0.95, "corrections": [...] }
     """
     try:
-        data = request.json
-        
-        # Decode base64 image
-        image_str = data['image']
-        # Remove data URL prefix if present
-        if ',' in image_str:
-            image_str = image_str.split(',')[1]
-        
-        image_data = base64.b64decode(image_str)
-        nparr = np.frombuffer(image_data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with profiler.stage('decode'):
+            data = request.json
+            frame = decode_image(data['image'])
         
         if frame is None:
             return jsonify({
@@ -272,11 +267,13 @@ def predict_pose():
                 'pose': None
             }), 400
         
-        # Convert BGR to RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
         # Process with MediaPipe
-        results = pose.process(frame_rgb)
+        with profiler.stage('pose'):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            with pose_tracker() as tracker:
+                results, complexity = process_frame(frame_rgb, session_id(), tracker)
+        if trace_writer:
+            trace_writer.write(time.time(), landmarks_to_array(results.pose_landmarks), session_id())
         
         if not results.pose_landmarks:
             return jsonify({
@@ -285,62 +282,20 @@ def predict_pose():
                 'pose': 'Unknown'
             })
         
-        # Extract features
-        features = extract_features(results.pose_landmarks)
-        
-        if features is None:
-            return jsonify({
-                'success': False,
-                'message': 'Could not extract features',
-                'pose': 'Unknown'
-            })
-        
-        # Predict pose
-        prediction = model.predict(features)[0]
-        probabilities = model.predict_proba(features)[0]
-        raw_confidence = float(np.max(probabilities))
-        
-        # Boost confidence to make it more lenient (scale from 0.3-1.0 to 0.6-1.0)
-        # Formula: new_conf = 0.6 + (raw_conf * 0.4)
-        # This ensures minimum 60% confidence and scales up from there
-        confidence = min(0.6 + (raw_confidence * 0.55), 0.99)
-        
-        # Model returns the pose name directly (string)
-        pose_name = str(prediction).lower()  # Keep lowercase for matching
+        # Extract features and predict pose
+        with profiler.stage('classify'):
+            model = models.model
+            landmarks = landmarks_to_array(results.pose_landmarks)
+            features = model_features(model, landmarks)
+            labels, raw_confidences = classify(model, features)
         
-        # Capitalize for display
-        pose_name_display = " ".join(word.capitalize() for word in pose_name.split())
-        
-        # Get angle-based corrections from correc.py logic
-        angle_corrections = check_pose_corrections(pose_name, results.pose_landmarks)
-        
-        # Get basic corrections as fallback
-        corrections_info = POSE_CORRECTIONS.get(pose_name_display, {})
-        basic_corrections = corrections_info.get('corrections', [])
-        
-        # Use angle corrections if available, otherwise use basic corrections
-        final_corrections = angle_corrections if angle_corrections else basic_corrections
-        
-        # Add "Good alignment" message if no corrections needed
-        if not angle_corrections and pose_name:
-            alignment_status = "✔ Good Alignment"
-        else:
-            alignment_status = "Adjust your pose"
-        
-        # Calculate some angles for feedback (example)
-        landmarks = results.pose_landmarks.landmark
-        
-        return jsonify({
-            'success': True,
-            'pose': pose_name,  # lowercase for matching
-            'pose_display': pose_name_display,
-            'confidence': confidence,
-            'description': corrections_info.get('description', ''),
-            'corrections': final_corrections,
-            'alignment_status': alignment_status,
-            'has_angle_corrections': len(angle_corrections) > 0,
-            'landmarks': [[lm.x, lm.y, lm.z, lm.visibility] for lm in landmarks]
-        })
+        with profiler.stage('corrections'):
+            response = build_prediction(labels[0], raw_confidences[0], landmarks)
+            response['model_complexity'] = complexity
+        if history:
+            history.record(session_id(), response)
+        with profiler.stage('serialize'):
+            return jsonify(response)
         
     except Exception as e:
         print(f"ERROR in predict_pose: {str(e)}")
@@ -352,6 +307,208 @@ def predict_pose():
             'pose': 'Unknown'
         }), 500
 
+@app.route('/api/predict-landmarks', methods=['POST'])
+def predict_from_landmarks():
+    """
+    Predict pose from landmarks estimated on the client (no image upload, no MediaPipe)
+    Expects: { "landmarks": [[x, y, z, visibility], ... 33 rows] }
+         or: application/octet-stream body of 33x4 little-endian float32 (528 bytes)
+    Returns: same body as /api/predict, without the landmarks echo
+    """
+    try:
+        if request.mimetype == 'application/octet-stream':
+            landmarks = parse_landmarks(request.get_data())
+        else:
+            landmarks = parse_landmarks((request.get_json(silent=True) or {}).get('landmarks'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e), 'pose': None}), 400
+
+    try:
+        if trace_writer:
+            trace_writer.write(time.time(), landmarks, session_id())
+
+        model = models.model
+        labels, raw_confidences = classify(model, model_features(model, landmarks))
+        response = build_prediction(labels[0], raw_confidences[0], landmarks, include_landmarks=False)
+        if history:
+            history.record(session_id(), response)
+        return jsonify(response)
+
+    except Exception as e:
+        print(f"ERROR in predict_from_landmarks: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'pose': 'Unknown'
+        }), 500
+
+def _decode_batch_frame(image_str):
+    """decode_image for one batch entry; None (reported per frame) when the entry is invalid"""
+    try:
+        return decode_image(image_str)
+    except (TypeError, ValueError, cv2.error):  # binascii.Error is a ValueError
+        return None
+
+def batch_frame_times(timestamps, count):
+    """
+    Server time of each batch frame. Client capture timestamps (seconds, any
+    clock) are anchored so the newest frame is at the arrival time, keeping
+    the spacing between frames without trusting the client's clock; without
+    them every frame gets the arrival time.
+    """
+    now = time.time()
+    if timestamps is None:
+        return [now] * count
+    if (not isinstance(timestamps, list) or len(timestamps) != count
+            or not all(isinstance(t, (int, float)) and not isinstance(t, bool) and math.isfinite(t)
+                       for t in timestamps)):
+        raise ValueError('"timestamps" must be one capture time in seconds per image')
+    if any(b < a for a, b in zip(timestamps, timestamps[1:])):
+        raise ValueError('"timestamps" must be in capture order')
+    if timestamps[-1] - timestamps[0] > MAX_BATCH_SPAN_S:
+        raise ValueError(f'"timestamps" span more than {MAX_BATCH_SPAN_S:.0f}s, expected seconds')
+    return [now - (timestamps[-1] - t) for t in timestamps]
+
+@app.route('/api/predict-batch', methods=['POST'])
+@admission_controlled
+def predict_pose_batch():
+    """
+    Predict poses for several buffered frames in one request
+    Expects: { "images": ["base64_encoded_image_string", ...] } (in capture order)
+             optional "timestamps": [capture time in seconds, ...], one per image
+    Returns: { "success": true, "results": [<same body as /api/predict>, ...] }
+    """
+    try:
+        images = request.json['images']
+        if not isinstance(images, list) or not images:
+            return jsonify({'success': False, 'message': '"images" must be a non-empty list'}), 400
+        if len(images) > MAX_BATCH_FRAMES:
+            return jsonify({
+                'success': False,
+                'message': f'At most {MAX_BATCH_FRAMES} frames per batch'
+            }), 413
+        try:
+            frame_times = batch_frame_times(request.json.get('timestamps'), len(images))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        frames = list(decode_pool.map(_decode_batch_frame, images))
+
+        # Frames go through the tracker one by one, in order, to keep temporal tracking
+        sid = session_id()
+        results = [None] * len(frames)
+        detected = []
+        landmarks_list = []
+        with pose_tracker() as tracker:
+            for i, frame in enumerate(frames):
+                if frame is None:
+                    results[i] = {'success': False, 'message': 'Failed to decode image', 'pose': None}
+                    continue
+                pose_results, _ = process_frame(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), sid, tracker)
+                if trace_writer:
+                    trace_writer.write(frame_times[i], landmarks_to_array(pose_results.pose_landmarks), sid)
+                if not pose_results.pose_landmarks:
+                    results[i] = {'success': False, 'message': 'No pose detected', 'pose': 'Unknown'}
+                    continue
+                detected.append(i)
+                landmarks_list.append(landmarks_to_array(pose_results.pose_landmarks))
+
+        if detected:
+            # Classifier and angle rules run once over the whole batch
+            landmarks = np.stack(landmarks_list)
+            model = models.model
+            labels, raw_confidences = classify(model, model_features(model, landmarks))
+            angles = calculate_angles(landmarks)
+            for j, i in enumerate(detected):
+                results[i] = build_prediction(labels[j], raw_confidences[j], landmarks[j], angles[j])
+                if history:
+                    history.record(sid, results[i], t=frame_times[i])
+
+        return jsonify({'success': True, 'results': results})
+
+    except Exception as e:
+        print(f"ERROR in predict_pose_batch: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Serving metrics (model_complexity switching when adaptive mode is on)"""
+    model = models.model
+    return jsonify({
+        'model': models.metrics(),
+        'admission': scheduler.metrics(),
+        'cascade': model.stats() if isinstance(model, CascadeClassifier) else None,
+        'history': history.metrics() if history else None,
+        'adaptive_complexity': adaptive_pose.metrics() if adaptive_pose else None
+    })
+
+@app.route('/api/admin/model/reload', methods=['POST'])
+@admin_required
+def reload_model():
+    """Check for a new model version now instead of waiting for the watcher"""
+    swapped = models.check()
+    return jsonify({'success': True, 'reloaded': swapped, 'model': models.metrics()})
+
+@app.route('/api/admin/model/rollback', methods=['POST'])
+@admin_required
+def rollback_model():
+    """Swap the previously served model back in"""
+    try:
+        version = models.rollback()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    return jsonify({'success': True, 'model_version': version, 'model': models.metrics()})
+
+@app.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def start_profile():
+    """
+    Start profiling /api/predict on this worker
+    Expects: { "seconds": 30, "requests": 200 } (either or both; defaults to 30 seconds)
+    Returns: { "success": true, "capture": { "id": "...", "state": "running", ... } }
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = min(float(data['seconds']), MAX_PROFILE_SECONDS) if 'seconds' in data else None
+        max_requests = int(data['requests']) if 'requests' in data else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if (seconds is not None and not seconds > 0) or (max_requests is not None and max_requests <= 0):
+        return jsonify({'success': False, 'message': '"seconds" and "requests" must be positive'}), 400
+    if seconds is None and max_requests is None:
+        seconds = 30.0
+    try:
+        capture = profiler.start(seconds=seconds, max_requests=max_requests)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    return jsonify({'success': True, 'capture': capture}), 202
+
+@app.route('/api/admin/profile', methods=['GET'])
+@admin_required
+def list_profiles():
+    """Running and recent profile captures"""
+    return jsonify({'success': True, 'active': profiler.status(), 'captures': profiler.captures()})
+
+@app.route('/api/admin/profile/<capture_id>', methods=['GET'])
+@admin_required
+def get_profile(capture_id):
+    """Download a finished capture as a zip (profile.prof, profile.txt, stages.json)"""
+    status = profiler.status(capture_id)
+    if status is None:
+        return jsonify({'success': False, 'message': 'Unknown capture'}), 404
+    path = profiler.path(capture_id)
+    if path is None:
+        return jsonify({'success': True, 'capture': status}), 202
+    return send_file(path, mimetype='application/zip', as_attachment=True,
+                     download_name=os.path.basename(path))
+
 @app.route('/api/poses', methods=['GET'])
 def get_poses():
     """Get list of all poses in the sequence"""
@@ -360,6 +517,166 @@ def get_poses():
         'total': len(POSE_ORDER)
     })
 
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    """
+    New session id plus the token that proves ownership of it. Send the id as
+    X-Session-Id on predict requests and the token as X-Session-Token to read
+    the session's history.
+    """
+    sid = uuid.uuid4().hex
+    return jsonify({'success': True, 'session_id': sid, 'session_token': session_token(sid)})
+
+@app.route('/api/sessions/<sid>/history', methods=['GET'])
+@own_session_required
+def get_session_history(sid):
+    """Most recent hold segments (pose, duration, confidence, top correction) of a session"""
+    if not history:
+        return jsonify({'success': False, 'message': 'Session history is disabled'}), 404
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify({'success': True, 'session_id': sid, 'segments': history.history(sid, limit)})
+
+@app.route('/api/sessions/<sid>/progress', methods=['GET'])
+@own_session_required
+def get_session_progress(sid):
+    """Per-pose progress of a session: hold time, holds, confidence and correction rate"""
+    if not history:
+        return jsonify({'success': False, 'message': 'Session history is disabled'}), 404
+    poses = history.progress(sid)
+    practiced = {normalize_pose_name(row['pose']) for row in poses}
+    sequence = list(dict.fromkeys(normalize_pose_name(pose) for pose in POSE_ORDER))
+    return jsonify({
+        'success': True,
+        'session_id': sid,
+        'poses': poses,
+        'sequence_coverage': round(sum(pose in practiced for pose in sequence) / len(sequence), 3),
+        'missing_poses': [pose for pose in sequence if pose not in practiced],
+    })
+
+# Offline video analysis jobs, keyed by job id. Jobs run video_analysis.py in a
+# separate process: its spawn-context worker pool would otherwise re-import this
+# module (model watcher, trace writer, history writer, ...) in every worker.
+# Jobs share the host with the predict path, so few run at once, each with few processes.
+VIDEO_ANALYSIS = os.path.join(HERE, 'video_analysis.py')
+VIDEO_JOB_WORKERS = int(os.environ.get('POSE_VIDEO_JOB_WORKERS', max(1, (os.cpu_count() or 1) // 4)))
+MAX_RUNNING_VIDEO_JOBS = int(os.environ.get('POSE_VIDEO_JOBS', 1))
+MAX_QUEUED_VIDEO_JOBS = 4
+MAX_FINISHED_VIDEO_JOBS = 20
+VIDEO_JOB_TTL_S = 3600
+video_jobs = {}
+video_jobs_lock = threading.Lock()
+video_job_slots = threading.BoundedSemaphore(MAX_RUNNING_VIDEO_JOBS)
+
+def _prune_video_jobs():
+    """Drop expired finished jobs and all but the newest MAX_FINISHED_VIDEO_JOBS (lock held)"""
+    now = time.time()
+    finished = [job_id for job_id, job in video_jobs.items() if job['status'] not in ('queued', 'running')]
+    for i, job_id in enumerate(finished):
+        if len(finished) - i > MAX_FINISHED_VIDEO_JOBS or now - video_jobs[job_id]['finished_at'] > VIDEO_JOB_TTL_S:
+            del video_jobs[job_id]
+
+def _analyze_in_subprocess(job_id, command, output_path):
+    """Run video_analysis.py, forwarding its chunk progress to the job; returns the timeline"""
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, encoding='utf-8', errors='replace',
+                               env={**os.environ, 'PYTHONIOENCODING': 'utf-8'})
+    output = []
+    for line in process.stdout:
+        # "✅ Chunk 3/12"
+        if 'Chunk ' in line:
+            done, total = line.rsplit('Chunk ', 1)[1].split('/')
+            with video_jobs_lock:
+                video_jobs[job_id]['progress'] = round(int(done) / int(total), 3)
+        else:
+            output = (output + [line.rstrip()])[-20:]
+    if process.wait() != 0:
+        raise RuntimeError(next((l for l in reversed(output) if l), 'video analysis failed'))
+
+    with open(output_path) as f:
+        return json.load(f)
+
+def _run_video_job(job_id, video_path, options):
+    fd, output_path = tempfile.mkstemp(suffix='.timeline.json')
+    os.close(fd)
+    command = [sys.executable, VIDEO_ANALYSIS, video_path, '-o', output_path,
+               '--stride', str(options['stride']),
+               '--chunk-seconds', str(options['chunk_seconds']),
+               '--model-complexity', str(options['model_complexity']),
+               '--workers', str(min(options['workers'] or VIDEO_JOB_WORKERS, VIDEO_JOB_WORKERS))]
+
+    try:
+        # Queued jobs wait here for one of the MAX_RUNNING_VIDEO_JOBS slots
+        with video_job_slots:
+            with video_jobs_lock:
+                video_jobs[job_id]['status'] = 'running'
+            timeline = _analyze_in_subprocess(job_id, command, output_path)
+        with video_jobs_lock:
+            video_jobs[job_id].update(status='done', progress=1.0, result=timeline, finished_at=time.time())
+    except Exception as e:
+        print(f"ERROR in video job {job_id}: {str(e)}")
+        with video_jobs_lock:
+            video_jobs[job_id].update(status='failed', message=str(e), finished_at=time.time())
+    finally:
+        os.remove(video_path)
+        os.remove(output_path)
+
+@app.route('/api/video-jobs', methods=['POST'])
+@admin_required
+def create_video_job():
+    """
+    Start offline analysis of an uploaded video (admin; at most POSE_MAX_UPLOAD_MB)
+    Expects: multipart form with a "video" file and optional
+             "stride", "workers", "chunk_seconds", "model_complexity" fields
+    Returns: { "job_id": "...", "status": "queued" }
+    """
+    with video_jobs_lock:
+        _prune_video_jobs()
+        pending = sum(job['status'] in ('queued', 'running') for job in video_jobs.values())
+    if pending >= MAX_RUNNING_VIDEO_JOBS + MAX_QUEUED_VIDEO_JOBS:
+        response = make_response(jsonify({'success': False, 'message': 'Too many video jobs, retry later'}), 503)
+        response.headers['Retry-After'] = '60'
+        return response
+
+    upload = request.files.get('video')
+    if upload is None:
+        return jsonify({'success': False, 'message': 'Missing "video" file'}), 400
+
+    try:
+        options = {
+            'stride': int(request.form.get('stride', 1)),
+            'workers': int(request.form['workers']) if 'workers' in request.form else None,
+            'chunk_seconds': float(request.form.get('chunk_seconds', 10.0)),
+            'model_complexity': int(request.form.get('model_complexity', 1)),
+        }
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if (options['stride'] <= 0 or options['chunk_seconds'] <= 0
+            or (options['workers'] is not None and options['workers'] <= 0)):
+        return jsonify({'success': False, 'message': '"stride", "workers" and "chunk_seconds" must be positive'}), 400
+    if options['model_complexity'] not in (0, 1, 2):
+        return jsonify({'success': False, 'message': '"model_complexity" must be 0, 1 or 2'}), 400
+
+    suffix = os.path.splitext(upload.filename or '')[1] or '.mp4'
+    fd, video_path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, 'wb') as f:
+        upload.save(f)
+
+    job_id = uuid.uuid4().hex
+    with video_jobs_lock:
+        video_jobs[job_id] = {'status': 'queued', 'progress': 0.0}
+    threading.Thread(target=_run_video_job, args=(job_id, video_path, options), daemon=True).start()
+
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'queued'}), 202
+
+@app.route('/api/video-jobs/<job_id>', methods=['GET'])
+def get_video_job(job_id):
+    """Get status, progress and (once done) the timeline of a video job"""
+    with video_jobs_lock:
+        job = video_jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'message': 'Unknown job'}), 404
+        return jsonify({'success': True, 'job_id': job_id, **job})
+
 @app.route('/api/start-correc', methods=['POST'])
 def start_correc():
     """
@@ -367,9 +684,6 @@ def start_correc():
     This runs the original correction system with OpenCV window
     """
     try:
-        import subprocess
-        import sys
-        
         correc_path = os.path.join(HERE, 'correc.py')
         bat_file = os.path.join(HERE, 'run_correc.bat')
         
@@ -413,12 +727,23 @@ def start_correc():
 
 if __name__ == '__main__':
     print("🚀 Starting Suryanamaskara Pose Detection API Server...")
-    print("📊 Model loaded successfully!")
+    print(f"📊 Model loaded successfully! (version {models.version})")
     print("🎯 Server running on http://localhost:5000")
     print("\n📝 Available endpoints:")
     print("   GET  /api/health       - Health check")
     print("   POST /api/predict      - Predict pose from image")
+    print("   POST /api/predict-landmarks - Predict pose from client-side landmarks")
+    print("   POST /api/predict-batch - Predict poses for several frames")
     print("   GET  /api/poses        - Get all poses in sequence")
+    print("   GET  /api/metrics      - Serving metrics")
+    print("   GET  /api/sessions/<id>/history  - Hold segments of a session")
+    print("   GET  /api/sessions/<id>/progress - Per-pose progress of a session")
+    print("   POST /api/admin/model/reload   - Load a new model version now (admin)")
+    print("   POST /api/admin/model/rollback - Roll back to the previous model (admin)")
+    print("   POST /api/admin/profile        - Profile /api/predict for N seconds/requests (admin)")
+    print("   GET  /api/admin/profile/<id>   - Download a finished profile (admin)")
+    print("   POST /api/video-jobs   - Analyse a recorded video (async, admin)")
+    print("   GET  /api/video-jobs/<id> - Video job status and timeline")
     print("   POST /api/start-correc - Launch Advanced Correction System (correc.py)")
     
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,87 @@
+"""
+Landmark-space data augmentation for training.
+
+Works directly on (N, 33, 4) landmark batches instead of re-running
+MediaPipe on more images:
+    mirror     - flip x and swap every LEFT_*/RIGHT_* PoseLandmark pair, so
+                 left-side-only angle rules see both body sides
+    rotation   - small in-plane rotation about the shoulder/hip center
+    scale      - jitter of the body size about the same center
+    dropout    - random landmarks get a near-zero visibility, as if occluded
+"""
+
+import numpy as np
+
+from pose_features import NUM_LANDMARKS, PL, body_center
+
+
+def _mirror_permutation():
+    perm = np.arange(NUM_LANDMARKS)
+    for landmark in PL:
+        # LEFT_* and MOUTH_LEFT
+        if "LEFT" in landmark.name:
+            right = PL[landmark.name.replace("LEFT", "RIGHT")]
+            perm[landmark.value], perm[right.value] = right.value, landmark.value
+    return perm
+
+
+MIRROR_PERMUTATION = _mirror_permutation()
+
+
+def mirror(landmarks):
+    """Left/right mirror of (N, 33, 4) landmarks in normalized image coordinates"""
+    out = np.array(landmarks, dtype=np.float32)[:, MIRROR_PERMUTATION, :]
+    out[..., 0] = 1.0 - out[..., 0]
+    # MediaPipe z is relative depth, unaffected by a horizontal flip
+    return out
+
+
+def rotate(landmarks, degrees):
+    """Rotate each sample in-plane by degrees[i] about its shoulder/hip center"""
+    out = np.array(landmarks, dtype=np.float32)
+    center = body_center(out)[:, None, :]
+    theta = np.radians(np.asarray(degrees, dtype=np.float32))
+    cos, sin = np.cos(theta)[:, None], np.sin(theta)[:, None]
+    x = out[..., 0] - center[..., 0]
+    y = out[..., 1] - center[..., 1]
+    out[..., 0] = center[..., 0] + x * cos - y * sin
+    out[..., 1] = center[..., 1] + x * sin + y * cos
+    return out
+
+
+def scale(landmarks, factors):
+    """Scale each sample's x, y, z by factors[i] about its shoulder/hip center"""
+    out = np.array(landmarks, dtype=np.float32)
+    center = body_center(out)[:, None, :]
+    factors = np.asarray(factors, dtype=np.float32)[:, None, None]
+    out[..., :2] = center + (out[..., :2] - center) * factors
+    out[..., 2:3] *= factors
+    return out
+
+
+def visibility_dropout(landmarks, rate, rng):
+    """Give a `rate` fraction of landmarks a near-zero visibility"""
+    out = np.array(landmarks, dtype=np.float32)
+    dropped = rng.random(out.shape[:2]) < rate
+    out[..., 3] = np.where(dropped, rng.uniform(0.0, 0.1, out.shape[:2]), out[..., 3])
+    return out
+
+
+def augment_batch(landmarks, labels, copies=1, mirror_prob=0.5, max_rotation=10.0,
+                  scale_jitter=0.1, dropout_rate=0.05, seed=42):
+    """
+    Generate `copies` augmented variants of every sample in one vectorized pass.
+    Returns (augmented_landmarks, augmented_labels), without the originals.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4)
+    out = np.tile(base, (copies, 1, 1))
+    out_labels = np.tile(np.asarray(labels), copies)
+    n = len(out)
+
+    flip = rng.random(n) < mirror_prob
+    out[flip] = mirror(out[flip])
+    out = rotate(out, rng.uniform(-max_rotation, max_rotation, n))
+    out = scale(out, rng.uniform(1.0 - scale_jitter, 1.0 + scale_jitter, n))
+    out = visibility_dropout(out, dropout_rate, rng)
+    return out, out_labels
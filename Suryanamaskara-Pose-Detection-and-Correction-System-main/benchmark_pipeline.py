@@ -0,0 +1,284 @@
+"""
+Benchmarks for the pose pipeline, stage by stage and end to end.
+
+Stages: base64 + cv2.imdecode at several resolutions, pose.process at
+model_complexity 0/1/2, feature extraction, forest predict/predict_proba,
+check_pose_corrections and jsonify of the response. With --url, a
+concurrent HTTP load test is run against a live /api/predict as well.
+
+Results (p50/p95/p99 latency, mean, throughput) are written as JSON;
+--compare flags regressions against a previous results file.
+
+Usage:
+    python benchmark_pipeline.py --image frame.jpg -o bench.json
+    python benchmark_pipeline.py --image frame.jpg --url http://localhost:5000 --concurrency 8 -o bench.json
+    python benchmark_pipeline.py --image frame.jpg -o new.json --compare bench.json --threshold 0.1
+
+The image must be a full-size camera frame with one whole body in view
+(e.g. a frame grabbed from a recorded session); the run stops if no pose
+is detected in it, since every later stage depends on the landmarks.
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from flask import Flask, jsonify
+
+from pose_pipeline import (
+    HERE, MODEL_PATH,
+    load_model, decode_image, create_pose, landmarks_to_array, model_features,
+    classify, check_pose_corrections, build_prediction
+)
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720)]
+
+
+def summarize(samples_s, wall_s=None):
+    """Latency percentiles (ms) and throughput for a list of per-call durations"""
+    samples_ms = np.asarray(samples_s) * 1000.0
+    wall_s = wall_s if wall_s is not None else float(np.sum(samples_s))
+    return {
+        "n": int(len(samples_ms)),
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples_ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(samples_ms, 99)), 4),
+        "mean_ms": round(float(np.mean(samples_ms)), 4),
+        "throughput_per_s": round(len(samples_ms) / wall_s, 2) if wall_s else None,
+    }
+
+
+def measure(fn, iterations, warmup=5):
+    """Time fn() `iterations` times after `warmup` untimed calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def encode_frame(image, size):
+    resized = cv2.resize(image, size)
+    ok, buf = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return base64.b64encode(buf.tobytes()).decode("ascii")
+
+
+def run_stage_benchmarks(image, iterations):
+    results = {}
+    model = load_model(MODEL_PATH)
+    app = Flask(__name__)
+
+    # 1. base64 + cv2.imdecode
+    for w, h in RESOLUTIONS:
+        encoded = encode_frame(image, (w, h))
+        results[f"decode_{w}x{h}"] = measure(lambda: decode_image(encoded), iterations)
+        print(f"✅ decode {w}x{h}")
+
+    frame_rgb = cv2.cvtColor(cv2.resize(image, (640, 480)), cv2.COLOR_BGR2RGB)
+
+    # 2. pose.process per model complexity
+    pose_results = None
+    for complexity in (0, 1, 2):
+        with create_pose(model_complexity=complexity) as pose:
+            results[f"pose_process_c{complexity}"] = measure(
+                lambda: pose.process(frame_rgb), max(10, iterations // 10))
+            if complexity == 1:
+                pose_results = pose.process(frame_rgb)
+        print(f"✅ pose.process model_complexity={complexity}")
+
+    if not pose_results.pose_landmarks:
+        raise RuntimeError("Pose tracking lost the body in the benchmark image")
+
+    # 3. Features, with the model's own feature set as on the serving path
+    pose_landmarks = pose_results.pose_landmarks
+    results["extract_features"] = measure(
+        lambda: model_features(model, landmarks_to_array(pose_landmarks)), iterations)
+    landmarks = landmarks_to_array(pose_landmarks)
+    features = model_features(model, landmarks)
+
+    # 4. Forest
+    results["forest_predict"] = measure(lambda: model.predict(features), iterations)
+    results["forest_predict_proba"] = measure(lambda: model.predict_proba(features), iterations)
+    results["classify"] = measure(lambda: classify(model, features), iterations)
+    labels, raw_confidences = classify(model, features)
+    print("✅ features + forest")
+
+    # 5. Angle rules, for the predicted pose and a pose with two checks
+    results["check_pose_corrections"] = measure(
+        lambda: check_pose_corrections(str(labels[0]), landmarks), iterations)
+    results["check_pose_corrections_2_rules"] = measure(
+        lambda: check_pose_corrections("bhujangasana", landmarks), iterations)
+
+    # 6. Response serialization
+    body = build_prediction(labels[0], raw_confidences[0], landmarks)
+    with app.app_context():
+        results["jsonify"] = measure(lambda: jsonify(body), iterations)
+    print("✅ corrections + jsonify")
+
+    # 7. Whole single-frame path (decode → response)
+    encoded = encode_frame(image, (640, 480))
+    with create_pose(model_complexity=1) as pose, app.app_context():
+        def end_to_end():
+            frame = decode_image(encoded)
+            res = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            lm = landmarks_to_array(res.pose_landmarks)
+            lab, conf = classify(model, model_features(model, lm))
+            return jsonify(build_prediction(lab[0], conf[0], lm))
+        results["end_to_end_640x480"] = measure(end_to_end, max(10, iterations // 10))
+    print("✅ end to end")
+
+    return results
+
+
+def detect_pose(image):
+    """Landmarks of the pose in the benchmark image at the benchmarked size, or None"""
+    with create_pose(model_complexity=1) as pose:
+        results = pose.process(cv2.cvtColor(cv2.resize(image, (640, 480)), cv2.COLOR_BGR2RGB))
+    return landmarks_to_array(results.pose_landmarks)
+
+
+def run_load_test(url, image, concurrency, requests_total):
+    """
+    Concurrent POSTs to <url>/api/predict. Latency stats cover served
+    requests only; requests shed with 503 are counted separately.
+    """
+    payload = json.dumps({"image": encode_frame(image, (640, 480))}).encode()
+    endpoint = url.rstrip("/") + "/api/predict"
+    samples = []
+    errors = 0
+    shed = 0
+    lock = threading.Lock()
+
+    def one_request(_):
+        nonlocal errors, shed
+        # One session per worker thread, so the per-session admission limit doesn't shed the load test
+        req = urllib.request.Request(endpoint, data=payload,
+                                     headers={"Content-Type": "application/json",
+                                              "X-Session-Id": f"loadtest-{threading.get_ident()}"})
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                resp.read()
+        except urllib.error.HTTPError as e:
+            outcome = "shed" if e.code == 503 else "error"
+        except Exception:
+            outcome = "error"
+        elapsed = time.perf_counter() - started
+        with lock:
+            if outcome == "ok":
+                samples.append(elapsed)
+            elif outcome == "shed":
+                shed += 1
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_request, range(requests_total)))
+    wall = time.perf_counter() - started
+
+    stats = summarize(samples, wall) if samples else {"n": 0}
+    stats.update(concurrency=concurrency, errors=errors, shed=shed)
+    return stats
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Print p50/p95 deltas against a baseline; returns the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':34} {'base p50':>10} {'new p50':>10} {'Δp50':>8} {'Δp95':>8}")
+    for name, stats in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if not base or not base.get("n") or not stats.get("n"):
+            continue
+        d50 = stats["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+        d95 = stats["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        flag = ""
+        if d50 > threshold or d95 > threshold:
+            regressions.append(name)
+            flag = "  ⚠️ regression"
+        print(f"{name:34} {base['p50_ms']:>10.3f} {stats['p50_ms']:>10.3f} "
+              f"{d50:>+8.1%} {d95:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pose pipeline")
+    parser.add_argument("-o", "--output", default=os.path.join(HERE, "benchmark_results.json"))
+    parser.add_argument("--image", required=True,
+                        help="Full-size camera frame with one whole body in view")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--skip-stages", action="store_true", help="Only run the HTTP load test")
+    parser.add_argument("--url", help="Base URL of a running api_server.py for the load test")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--compare", metavar="BASELINE", help="Previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative p50/p95 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image)
+    if image is None:
+        raise FileNotFoundError(f"Could not read benchmark image {args.image}")
+    if detect_pose(image) is None:
+        print(f"❌ No pose detected in {args.image}; the classify, corrections and response stages "
+              "need one. Use a full-body camera frame.")
+        sys.exit(1)
+
+    benchmarks = {}
+    if not args.skip_stages:
+        benchmarks.update(run_stage_benchmarks(image, args.iterations))
+    if args.url:
+        benchmarks["http_predict"] = run_load_test(args.url, image, args.concurrency, args.requests)
+        load = benchmarks["http_predict"]
+        print(f"✅ HTTP load test ({args.concurrency} concurrent): "
+              f"{load['n']} served, {load['shed']} shed (503), {load['errors']} errors")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "benchmarks": benchmarks,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n🎯 Benchmark results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+Incremental dataset → model build.
+
+Runs the training pipeline as stages with declared inputs and outputs:
+
+    organize   _annotations.coco.json per split    → class folders    (organize_dataset.py)
+    dedupe     all images (only with --dedupe)      → dedupe_manifest.json
+    extract    images of one split/class folder     → build_cache/landmarks/<split>__<class>.npz
+    merge      all extract shards                   → pose_landmarks.csv
+    reference  train extract shards                 → reference_stats.npz
+    train      merged dataset + train options       → pose_classifier_rf.pkl (train_pose_model.py,
+                                                      or update_pose_model.py for small additions)
+
+Every stage and shard is fingerprinted from the content hashes of its
+inputs, its settings and the source of the code it runs; it only reruns
+when the fingerprint changes or its output is missing. Extraction also
+reuses the landmarks of unchanged images inside a changed shard, so adding
+one image runs MediaPipe on one image. Shards are extracted in parallel
+processes, and the reference and train stages run concurrently.
+
+When the merged dataset only gained a few rows since the last train run
+(at most MAX_UPDATE_FRACTION of it) and the train options and code are
+unchanged, the new rows go through update_pose_model.py instead of a full
+grid search. Removed rows, an update that regresses, or --force train
+run the full train_pose_model.py search. --force extract re-runs
+MediaPipe on every image instead of reusing cached landmarks.
+
+The landmarks computed once by the extract stage also feed the reference
+statistics, so compute_reference_keypoints.py's second MediaPipe pass
+over train/ is not needed here.
+
+Usage:
+    python build_pipeline.py
+    python build_pipeline.py --dedupe --features engineered --augment 3 --workers 8
+    python build_pipeline.py --dry-run
+    python build_pipeline.py --force train
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing as mp_proc
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import mediapipe as mp
+import numpy as np
+
+import dedupe_dataset
+from dedupe_dataset import SPLITS, list_images, load_skip_list
+from extract_landmarks import extract_landmarks
+from pose_features import FEATURE_COLUMNS, NUM_LANDMARKS
+from pose_pipeline import HERE, REF_PATH
+
+CACHE_DIR = os.path.join(HERE, "build_cache")
+STATE_PATH = os.path.join(CACHE_DIR, "state.json")
+SHARD_DIR = os.path.join(CACHE_DIR, "landmarks")
+CSV_PATH = os.path.join(HERE, "pose_landmarks.csv")
+# Copy of the dataset the current model was trained or updated on, and the rows added since
+TRAINED_CSV_PATH = os.path.join(CACHE_DIR, "trained.csv")
+NEW_SAMPLES_PATH = os.path.join(CACHE_DIR, "new_samples.csv")
+MAX_UPDATE_FRACTION = 0.1
+STAGES = ["organize", "dedupe", "extract", "merge", "reference", "train"]
+
+# Source files each stage runs; editing any of them invalidates the stage.
+# extract's own code in this file is its MediaPipe settings, hashed via EXTRACT_SETTINGS
+# instead, so unrelated edits here don't rerun MediaPipe over the whole dataset.
+STAGE_SOURCES = {
+    "organize": ["organize_dataset.py"],
+    "dedupe": ["dedupe_dataset.py"],
+    "extract": ["extract_landmarks.py"],
+    "merge": ["build_pipeline.py", "pose_features.py"],
+    "reference": ["build_pipeline.py", "reference_stats.py", "pose_features.py"],
+    "train": ["train_pose_model.py", "pose_features.py", "augment_landmarks.py", "model_registry.py"],
+}
+
+EXTRACT_SETTINGS = {"static_image_mode": True, "min_detection_confidence": 0.5}
+
+# Per-process state, populated by _init_extract_worker
+_pose = None
+
+
+def fingerprint(*parts):
+    """Stable hash of JSON-serializable parts"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _init_extract_worker(settings):
+    global _pose
+    _pose = mp.solutions.pose.Pose(**settings)
+
+
+def _extract_images(rel_paths):
+    """(len(rel_paths), 132) landmarks, NaN rows where no pose was detected"""
+    rows = np.full((len(rel_paths), NUM_LANDMARKS * 4), np.nan)
+    for i, rel_path in enumerate(rel_paths):
+        landmarks = extract_landmarks(os.path.join(HERE, rel_path), _pose)
+        if landmarks is not None:
+            rows[i] = landmarks
+    return rows
+
+
+class Build:
+    def __init__(self, workers=None, dry_run=False, force=()):
+        self.workers = workers or os.cpu_count() or 1
+        self.dry_run = dry_run
+        self.force = set(force)
+        self.state = {"stages": {}, "file_hashes": {}}
+        if os.path.exists(STATE_PATH):
+            with open(STATE_PATH) as f:
+                self.state = json.load(f)
+        self.ran = []
+        # reference and train finish concurrently; state updates go through this lock
+        self._lock = threading.Lock()
+
+    def save_state(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{STATE_PATH}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, STATE_PATH)
+
+    def content_hash(self, rel_path):
+        """sha1 of a dataset file, re-read only when its size or mtime changed"""
+        st = os.stat(os.path.join(HERE, rel_path))
+        cached = self.state["file_hashes"].get(rel_path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        digest = file_hash(os.path.join(HERE, rel_path))
+        self.state["file_hashes"][rel_path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def code_hash(self, stage):
+        return fingerprint([file_hash(os.path.join(HERE, name)) for name in STAGE_SOURCES[stage]])
+
+    def up_to_date(self, name, fp, outputs):
+        return (name not in self.force and name.split(":")[0] not in self.force
+                and self.state["stages"].get(name) == fp and all(os.path.exists(p) for p in outputs))
+
+    def run(self, name, fp, outputs, action):
+        """Run `action` unless the stage's fingerprint and outputs are unchanged"""
+        if self.up_to_date(name, fp, outputs):
+            print(f"✅ {name} up to date")
+            return False
+        if self.dry_run:
+            print(f"🔨 {name} would run")
+            return True
+        print(f"🔨 {name}")
+        started = time.perf_counter()
+        action()
+        with self._lock:
+            self.state["stages"][name] = fp
+            self.ran.append((name, round(time.perf_counter() - started, 2)))
+            self.save_state()
+        return True
+
+    # ---------------- Stages ----------------
+
+    def organize(self):
+        annotations = [os.path.join(split, "_annotations.coco.json") for split in SPLITS
+                       if os.path.exists(os.path.join(HERE, split, "_annotations.coco.json"))]
+        if not annotations:
+            return
+        fp = fingerprint(self.code_hash("organize"), {p: self.content_hash(p) for p in annotations})
+        self.run("organize", fp, [], lambda: subprocess.run(
+            [sys.executable, os.path.join(HERE, "organize_dataset.py")], check=True))
+
+    def dedupe(self, images, threshold):
+        fp = fingerprint(self.code_hash("dedupe"), threshold,
+                         [(p, self.content_hash(p)) for p, _, _ in images])
+
+        def action():
+            hashes = dedupe_dataset.hash_images([p for p, _, _ in images], self.workers)
+            manifest = dedupe_dataset.build_manifest(images, hashes, threshold)
+            with open(dedupe_dataset.MANIFEST_PATH, "w") as f:
+                json.dump(manifest, f, indent=1)
+            print(f"   {len(manifest['skip'])} near-duplicates skipped, leakage: {manifest['leakage'] or 'none'}")
+
+        self.run("dedupe", fp, [dedupe_dataset.MANIFEST_PATH], action)
+
+    def extract(self, images, dedupe=False):
+        """Fingerprint and (re)extract every split/class shard; returns {shard: fingerprint}"""
+        # A manifest left over from an earlier --dedupe build only applies when the stage is enabled
+        skip = load_skip_list() if dedupe else set()
+        code = fingerprint(self.code_hash("extract"), EXTRACT_SETTINGS)
+        shards = {}
+        for rel_path, split, label in images:
+            if rel_path not in skip:
+                shards.setdefault(f"{split}__{label}", []).append(rel_path)
+
+        fingerprints, pending = {}, []
+        for shard, paths in sorted(shards.items()):
+            hashes = [self.content_hash(p) for p in paths]
+            fp = fingerprint(code, list(zip(paths, hashes)))
+            fingerprints[shard] = fp
+            if not self.up_to_date(f"extract:{shard}", fp, [self.shard_path(shard)]):
+                pending.append((shard, paths, hashes, fp))
+
+        if not pending:
+            print(f"✅ extract up to date ({len(shards)} shards)")
+            return fingerprints
+        if self.dry_run:
+            for shard, *_ in pending:
+                print(f"🔨 extract:{shard} would run")
+            return fingerprints
+
+        # Reuse landmarks of images whose content (and the extraction code) didn't change
+        jobs = []
+        plans = []
+        for shard, paths, hashes, fp in pending:
+            cached = None if "extract" in self.force else self.load_shard(shard)
+            reuse = {}
+            if cached is not None and str(cached["code"]) == code:
+                reuse = dict(zip(cached["hashes"].tolist(), cached["landmarks"]))
+            todo = [i for i, h in enumerate(hashes) if h not in reuse]
+            plans.append((shard, paths, hashes, fp, reuse, todo))
+            for start in range(0, len(todo), 16):
+                jobs.append((len(plans) - 1, todo[start:start + 16]))
+
+        new_images = sum(len(plan[5]) for plan in plans)
+        print(f"🔨 extract: {len(pending)} of {len(shards)} shards changed, {new_images} images to process")
+        started = time.perf_counter()
+        results = {}
+        if jobs:
+            # spawn keeps MediaPipe's internal threads out of the forked children
+            ctx = mp_proc.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs)), mp_context=ctx,
+                                     initializer=_init_extract_worker,
+                                     initargs=(EXTRACT_SETTINGS,)) as executor:
+                futures = [(job, executor.submit(_extract_images, [plans[job[0]][1][i] for i in job[1]]))
+                           for job in jobs]
+                for (plan_index, indices), future in futures:
+                    for i, row in zip(indices, future.result()):
+                        results[(plan_index, i)] = row
+
+        os.makedirs(SHARD_DIR, exist_ok=True)
+        for plan_index, (shard, paths, hashes, fp, reuse, _) in enumerate(plans):
+            rows = np.stack([results[(plan_index, i)] if (plan_index, i) in results else reuse[h]
+                             for i, h in enumerate(hashes)])
+            self.save_shard(shard, paths, hashes, rows, code)
+            self.state["stages"][f"extract:{shard}"] = fp
+        self.ran.append(("extract", round(time.perf_counter() - started, 2)))
+        self.save_state()
+        return fingerprints
+
+    def merge(self, shard_fps):
+        """Write pose_landmarks.csv from the shards; returns the stage fingerprint"""
+        fp = fingerprint(self.code_hash("merge"), shard_fps)
+
+        def action():
+            with open(CSV_PATH, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(FEATURE_COLUMNS + ["label"])
+                for shard in sorted(shard_fps, key=self._shard_order):
+                    data = self.load_shard(shard)
+                    label = shard.split("__", 1)[1]
+                    for row in data["landmarks"]:
+                        if not np.isnan(row[0]):
+                            writer.writerow(row.tolist() + [label])
+
+        self.run("merge", fp, [CSV_PATH], action)
+        return fp
+
+    def reference(self, shard_fps):
+        from reference_stats import PoseStatsAccumulator, save_reference_stats
+        train_fps = {shard: shard_fp for shard, shard_fp in shard_fps.items() if shard.startswith("train__")}
+        fp = fingerprint(self.code_hash("reference"), train_fps)
+
+        def action():
+            pose_stats = {}
+            for shard in sorted(train_fps):
+                stats = PoseStatsAccumulator()
+                for row in self.load_shard(shard)["landmarks"]:
+                    if not np.isnan(row[0]):
+                        stats.update(row.reshape(NUM_LANDMARKS, 4))
+                if stats.count:
+                    pose_stats[shard.split("__", 1)[1]] = stats
+            save_reference_stats(pose_stats, REF_PATH)
+
+        self.run("reference", fp, [REF_PATH], action)
+
+    def train(self, merge_fp, options):
+        code = self.code_hash("train")
+        fp = fingerprint(code, file_hash(os.path.join(HERE, "update_pose_model.py")), merge_fp, options)
+        # Only the grid search's own inputs; a change here always needs a full retrain
+        full_fp = fingerprint(code, options)
+        args = [sys.executable, os.path.join(HERE, "train_pose_model.py")]
+        for key, value in options.items():
+            args += [f"--{key}", str(value)]
+
+        def full():
+            subprocess.run(args, check=True)
+            with self._lock:
+                self.state["stages"]["train:full"] = full_fp
+
+        def action():
+            added = None
+            if ("train" not in self.force and self.state["stages"].get("train:full") == full_fp
+                    and os.path.exists(TRAINED_CSV_PATH)):
+                added = self.added_rows(TRAINED_CSV_PATH, CSV_PATH)
+            if added is None:
+                full()
+            elif added:
+                print(f"   {len(added)} new rows, updating the current model instead of a full retrain")
+                with open(NEW_SAMPLES_PATH, "w", newline="") as f:
+                    f.write("".join([self.csv_header(CSV_PATH)] + added))
+                update = subprocess.run([sys.executable, os.path.join(HERE, "update_pose_model.py"),
+                                         NEW_SAMPLES_PATH, "--csv", CSV_PATH])
+                if update.returncode != 0:
+                    print("⚠️ Incremental update failed, running the full grid search")
+                    full()
+            shutil.copyfile(CSV_PATH, TRAINED_CSV_PATH)
+
+        self.run("train", fp, [os.path.join(HERE, "pose_classifier_rf.pkl")], action)
+
+    @staticmethod
+    def csv_header(path):
+        with open(path) as f:
+            return f.readline()
+
+    @staticmethod
+    def added_rows(old_path, new_path):
+        """
+        Rows of new_path that are not in old_path, or None when rows were removed
+        or too many were added for an incremental update
+        """
+        with open(old_path) as f:
+            old = Counter(f.readlines()[1:])
+        with open(new_path) as f:
+            new = Counter(f.readlines()[1:])
+        if old - new:
+            return None
+        added = list((new - old).elements())
+        if len(added) > MAX_UPDATE_FRACTION * sum(new.values()):
+            return None
+        return added
+
+    # ---------------- Shard files ----------------
+
+    @staticmethod
+    def _shard_order(shard):
+        split, label = shard.split("__", 1)
+        return SPLITS.index(split), label
+
+    @staticmethod
+    def shard_path(shard):
+        return os.path.join(SHARD_DIR, f"{shard}.npz")
+
+    def load_shard(self, shard):
+        path = self.shard_path(shard)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    def save_shard(self, shard, paths, hashes, landmarks, code):
+        path = self.shard_path(shard)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, paths=np.array(paths), hashes=np.array(hashes), landmarks=landmarks,
+                 code=np.array(code))
+        os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally build the dataset, reference stats and model")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--dedupe", action="store_true", help="Run the near-duplicate stage")
+    parser.add_argument("--threshold", type=int, default=dedupe_dataset.DEFAULT_THRESHOLD)
+    parser.add_argument("--features", choices=["raw", "engineered"], default="raw")
+    parser.add_argument("--augment", type=int, default=0)
+    parser.add_argument("--force", nargs="*", default=[], choices=STAGES, help="Rerun these stages")
+    parser.add_argument("--dry-run", action="store_true", help="Only print which stages would run")
+    args = parser.parse_args()
+
+    build = Build(workers=args.workers, dry_run=args.dry_run, force=args.force)
+    started = time.perf_counter()
+
+    build.organize()
+    images = list_images()
+    if not images:
+        print("⚠️ No images found in train/, valid/ or test/")
+        return
+    if args.dedupe:
+        build.dedupe(images, args.threshold)
+    shard_fps = build.extract(images, dedupe=args.dedupe)
+    merge_fp = build.merge(shard_fps)
+
+    # Reference statistics and training are independent of each other
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(build.reference, shard_fps),
+                   executor.submit(build.train, merge_fp, {"features": args.features, "augment": args.augment})]
+        for future in futures:
+            future.result()
+
+    if not args.dry_run:
+        build.save_state()
+    print(f"\n🎯 Build finished in {time.perf_counter() - started:.1f}s")
+    for name, seconds in build.ran:
+        print(f"   {name:12} {seconds}s")
+    if not build.ran:
+        print("   nothing to do, everything is up to date")
+
+
+if __name__ == "__main__":
+    main()
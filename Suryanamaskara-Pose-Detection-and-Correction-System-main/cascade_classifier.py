@@ -0,0 +1,253 @@
+"""
+Cascade pose classifier: cheap geometric stage first, random forest only
+for ambiguous frames.
+
+Stage 1 computes a small signature per frame (both-side joint angles plus
+torso tilt and body-part heights normalized by torso length) and runs a
+shallow decision tree distilled from the forest's own predictions. Leaves
+where the tree agrees with the forest on (almost) every training frame are
+marked confident; frames landing there are resolved immediately. All other
+frames fall through to the full forest.
+
+Usage:
+    python cascade_classifier.py build              # writes pose_cascade.pkl
+    python cascade_classifier.py parity             # agreement with the forest on the dataset
+"""
+
+import argparse
+import os
+import sys
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier, export_text
+
+from pose_features import BODY_ANGLES, joint_angles, torso_tilt, model_features
+from pose_pipeline import HERE, MODEL_PATH, FEATURE_COLUMNS, NUM_LANDMARKS, PL, load_model
+
+CASCADE_PATH = os.path.join(HERE, "pose_cascade.pkl")
+CSV_PATH = os.path.join(HERE, "pose_landmarks.csv")
+PROBE_FRAMES = 512
+
+SIGNATURE_NAMES = list(BODY_ANGLES) + [
+    "torso_tilt", "hip_rel_y", "wrist_rel_y", "ankle_rel_y", "nose_rel_y"
+]
+
+
+def _mid(xy, left, right):
+    return (xy[:, left] + xy[:, right]) / 2.0
+
+
+def signature(landmarks):
+    """Compute the (N, 13) stage-1 signature for (N, 33, 4) landmarks"""
+    lm = np.asarray(landmarks, dtype=np.float64).reshape(-1, NUM_LANDMARKS, 4)
+    xy = lm[..., :2]
+    angles = joint_angles(lm, list(BODY_ANGLES.values()))
+
+    shoulders = _mid(xy, PL.LEFT_SHOULDER.value, PL.RIGHT_SHOULDER.value)
+    hips = _mid(xy, PL.LEFT_HIP.value, PL.RIGHT_HIP.value)
+    wrists = _mid(xy, PL.LEFT_WRIST.value, PL.RIGHT_WRIST.value)
+    ankles = _mid(xy, PL.LEFT_ANKLE.value, PL.RIGHT_ANKLE.value)
+    nose = xy[:, PL.NOSE.value]
+
+    torso_len = np.linalg.norm(shoulders - hips, axis=1) + 1e-6
+
+    return np.column_stack([
+        angles,
+        torso_tilt(lm),
+        (hips[:, 1] - shoulders[:, 1]) / torso_len,
+        (wrists[:, 1] - shoulders[:, 1]) / torso_len,
+        (ankles[:, 1] - hips[:, 1]) / torso_len,
+        (nose[:, 1] - shoulders[:, 1]) / torso_len,
+    ])
+
+
+class CascadeClassifier:
+    """
+    Wraps the forest behind the geometric stage. Exposes classes_,
+    predict_proba and predict like the forest, so it is a drop-in model.
+    Takes raw features; the forest may use any feature set.
+    """
+
+    feature_set_ = "raw"
+
+    def __init__(self, stage, forest):
+        if list(stage["classes"]) != list(forest.classes_):
+            raise ValueError("Cascade stage was built for a different forest")
+        self.stage = stage
+        self.forest = forest
+        self.classes_ = forest.classes_
+        # Counters are updated from concurrent request threads
+        self._stats_lock = threading.Lock()
+        self.frames = 0
+        self.early = 0
+
+    def predict_proba(self, features):
+        features = np.asarray(features, dtype=np.float32)
+        leaves = self.stage["tree"].apply(signature(features))
+        early = self.stage["confident"][leaves]
+
+        probabilities = np.empty((len(features), len(self.classes_)))
+        probabilities[early] = self.stage["leaf_proba"][leaves[early]]
+        if not early.all():
+            probabilities[~early] = self.forest.predict_proba(
+                model_features(self.forest, features[~early]))
+
+        with self._stats_lock:
+            self.frames += len(features)
+            self.early += int(early.sum())
+        return probabilities
+
+    def predict(self, features):
+        return self.classes_[np.argmax(self.predict_proba(features), axis=1)]
+
+    def stats(self):
+        with self._stats_lock:
+            frames, early = self.frames, self.early
+        return {
+            "frames": frames,
+            "resolved_early": early,
+            "early_fraction": round(early / frames, 4) if frames else None,
+        }
+
+    def reset_stats(self):
+        """Forget frames classified so far (parity checks, warm-up)"""
+        with self._stats_lock:
+            self.frames = self.early = 0
+
+
+def load_cascade(forest, path=CASCADE_PATH):
+    """Wrap a loaded forest with the cascade stage saved at `path`"""
+    return CascadeClassifier(joblib.load(path), forest)
+
+
+def wrap_forest(forest, path=CASCADE_PATH, min_agreement=0.99):
+    """
+    Serve `forest` behind the cascade at `path` only if the stage still
+    matches it: the stage was distilled from one specific forest, so its
+    early exits are re-checked against this forest on the held-out probe
+    frames saved with the stage. Otherwise the bare forest is returned.
+    """
+    try:
+        cascade = load_cascade(forest, path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Serving the forest without the cascade: {e}")
+        return forest
+    probe = cascade.stage.get("probe_features")
+    if probe is None:
+        print("⚠️ Serving the forest without the cascade: stage has no probe frames, rebuild it")
+        return forest
+    agreement = float(np.mean(cascade.predict(probe) == forest.predict(model_features(forest, probe))))
+    cascade.reset_stats()
+    if agreement < min_agreement:
+        print(f"⚠️ Serving the forest without the cascade: agreement {agreement:.4f} "
+              f"with this forest is below {min_agreement}, rebuild it")
+        return forest
+    return cascade
+
+
+def build_stage(X, forest_labels, classes, max_depth=6, min_samples_leaf=20,
+                min_purity=0.99, min_support=30):
+    """
+    Distill a shallow tree from the forest's predictions on the signatures of X.
+    Leaves whose training frames agree with the forest at least `min_purity`
+    of the time (and hold at least `min_support` frames) are marked confident.
+    """
+    sig = signature(X)
+    tree = DecisionTreeClassifier(max_depth=max_depth, min_samples_leaf=min_samples_leaf,
+                                  random_state=42)
+    tree.fit(sig, forest_labels)
+
+    class_index = {label: i for i, label in enumerate(classes)}
+    node_count = tree.tree_.node_count
+    counts = np.zeros((node_count, len(classes)))
+    np.add.at(counts, (tree.apply(sig), [class_index[label] for label in forest_labels]), 1)
+
+    support = counts.sum(axis=1)
+    leaf_proba = np.divide(counts, support[:, None], out=np.zeros_like(counts),
+                           where=support[:, None] > 0)
+    confident = (support >= min_support) & (leaf_proba.max(axis=1) >= min_purity)
+
+    return {
+        "version": 2,
+        "classes": list(classes),
+        "signature_names": SIGNATURE_NAMES,
+        "tree": tree,
+        "leaf_proba": leaf_proba,
+        "confident": confident,
+        "rules": export_text(tree, feature_names=SIGNATURE_NAMES),
+    }
+
+
+def parity_report(cascade, forest, X, y):
+    """Agreement of the cascade with the forest (and both with the labels)"""
+    forest_pred = forest.predict(model_features(forest, X))
+    cascade.reset_stats()
+    cascade_pred = cascade.predict(X)
+    return {
+        "samples": int(len(X)),
+        "agreement_with_forest": float(np.mean(cascade_pred == forest_pred)),
+        "forest_accuracy": float(np.mean(forest_pred == y)),
+        "cascade_accuracy": float(np.mean(cascade_pred == y)),
+        **cascade.stats(),
+    }
+
+
+def _print_report(title, report):
+    print(f"\n📊 {title}")
+    for key, value in report.items():
+        print(f"   {key:24} {value:.4f}" if isinstance(value, float) else f"   {key:24} {value}")
+
+
+def load_dataset(csv_path):
+    df = pd.read_csv(csv_path)
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float32), df["label"].to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or check the cascade pose classifier")
+    parser.add_argument("command", choices=["build", "parity"])
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--cascade", default=CASCADE_PATH)
+    parser.add_argument("--max-depth", type=int, default=6)
+    parser.add_argument("--min-purity", type=float, default=0.99)
+    parser.add_argument("--min-support", type=int, default=30)
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="parity: fail if agreement with the forest is lower")
+    args = parser.parse_args()
+
+    forest = load_model(args.model)
+    X, y = load_dataset(args.csv)
+
+    if args.command == "build":
+        # Same split as train_pose_model.py, so parity is measured on unseen frames
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
+        stage = build_stage(X_train, forest.predict(model_features(forest, X_train)), forest.classes_,
+                            max_depth=args.max_depth, min_purity=args.min_purity,
+                            min_support=args.min_support)
+        # Held-out frames for re-checking parity against whichever forest the stage is served with
+        rng = np.random.default_rng(42)
+        stage["probe_features"] = X_test[rng.choice(len(X_test), min(PROBE_FRAMES, len(X_test)), replace=False)]
+        joblib.dump(stage, args.cascade)
+        print(stage["rules"])
+        print(f"✅ {int(stage['confident'].sum())} confident leaves")
+        _print_report("Held-out parity", parity_report(CascadeClassifier(stage, forest), forest, X_test, y_test))
+        print(f"\n💾 Cascade saved as {args.cascade}")
+        return
+
+    report = parity_report(load_cascade(forest, args.cascade), forest, X, y)
+    _print_report(f"Parity on {args.csv}", report)
+    if report["agreement_with_forest"] < args.min_agreement:
+        print(f"\n❌ Agreement {report['agreement_with_forest']:.4f} is below {args.min_agreement}")
+        sys.exit(1)
+    print("\n✅ Cascade matches the forest")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import cv2
 import mediapipe as mp
 import os
-import numpy as np
-import pickle
+
+from dedupe_dataset import load_skip_list, relative_path
+from pose_pipeline import REF_PATH, landmarks_to_array
+from reference_stats import PoseStatsAccumulator, save_reference_stats
 
 # --------------------------
 # Path to your TRAIN dataset only
@@ -18,7 +20,10 @@ IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
 # --------------------------
 mp_pose = mp.solutions.pose
 
-pose_keypoints = {}
+# Running statistics per pose; each image is folded in and dropped (see reference_stats.py)
+pose_stats = {}
+# Near-duplicates found by dedupe_dataset.py would over-weight the averages
+skip = load_skip_list()
 
 with mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.5) as pose:
     for pose_name in os.listdir(DATASET_PATH):
@@ -26,13 +31,15 @@ with mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.5) as pose:
         if not os.path.isdir(pose_folder):
             continue
 
-        keypoints_list = []
+        stats = PoseStatsAccumulator()
 
         for img_file in os.listdir(pose_folder):
             if not img_file.lower().endswith(IMAGE_EXTENSIONS):
                 continue
 
             img_path = os.path.join(pose_folder, img_file)
+            if relative_path(img_path) in skip:
+                continue
             image = cv2.imread(img_path)
             if image is None:
                 print(f"⚠️ Could not read {img_path}")
@@ -42,22 +49,15 @@ with mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.5) as pose:
             results = pose.process(image_rgb)
 
             if results.pose_landmarks:
-                landmarks = results.pose_landmarks.landmark
-                keypoints = []
-                for lm in landmarks:
-                    keypoints.extend([lm.x, lm.y, lm.z])  # Include z-axis
-                keypoints_list.append(np.array(keypoints).flatten())
-
-        if keypoints_list:
-            avg_keypoints = np.mean(keypoints_list, axis=0)
-            pose_keypoints[pose_name] = avg_keypoints.tolist()
-            print(f"✅ Computed average keypoints for: {pose_name}")
+                stats.update(landmarks_to_array(results.pose_landmarks))
+
+        if stats.count:
+            pose_stats[pose_name] = stats
+            print(f"✅ Computed reference statistics for: {pose_name} ({stats.count} images)")
         else:
             print(f"⚠️ No valid keypoints found for: {pose_name}")
 
-# Save the reference keypoints to a file
-output_path = os.path.join(HERE, "reference_keypoints.pkl")
-with open(output_path, "wb") as f:
-    pickle.dump(pose_keypoints, f)
+# Save the reference statistics to a file
+save_reference_stats(pose_stats, REF_PATH)
 
-print(f"\n🎯 Reference keypoints saved as '{output_path}'")
+print(f"\n🎯 Reference statistics saved as '{REF_PATH}'")
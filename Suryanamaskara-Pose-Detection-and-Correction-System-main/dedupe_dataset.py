@@ -0,0 +1,199 @@
+"""
+Near-duplicate detection for the organized dataset (run after organize_dataset.py).
+
+Every image under train/, valid/ and test/ gets a 64-bit perceptual hash
+(DCT of a 32x32 grayscale thumbnail), computed in parallel worker processes.
+Images whose hashes differ in at most --threshold bits are clustered, within
+and across splits. One image per cluster (and label) is kept; the rest are
+listed in dedupe_manifest.json, which extract_landmarks.py and
+compute_reference_keypoints.py skip. Clusters spanning several splits are
+reported as train/test leakage.
+
+Usage:
+    python dedupe_dataset.py                  # writes dedupe_manifest.json
+    python dedupe_dataset.py --threshold 4 --workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(HERE, "dedupe_manifest.json")
+SPLITS = ["train", "valid", "test"]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+DEFAULT_THRESHOLD = 6
+
+# Popcount of every byte value, for Hamming distances between packed hashes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Kept representatives are taken from evaluation splits first
+_SPLIT_PRIORITY = {"test": 0, "valid": 1, "train": 2}
+
+
+def relative_path(path):
+    """Dataset-relative key used in the manifest, e.g. train/Pranamasana/x.jpg"""
+    return os.path.relpath(path, HERE).replace(os.sep, "/")
+
+
+def load_skip_list(path=MANIFEST_PATH):
+    """Relative paths of the duplicates to skip; empty if dedupe_dataset.py hasn't been run"""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(json.load(f)["skip"])
+
+
+def list_images(base=HERE):
+    """(relative_path, split, label) of every image in the organized split folders"""
+    images = []
+    for split in SPLITS:
+        split_path = os.path.join(base, split)
+        if not os.path.isdir(split_path):
+            continue
+        for label in sorted(os.listdir(split_path)):
+            folder = os.path.join(split_path, label)
+            if not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append((relative_path(os.path.join(folder, name)), split, label))
+    return images
+
+
+def perceptual_hash(path):
+    """64-bit DCT hash as 8 bytes, or None if the image can't be read"""
+    # Reduced decode is much cheaper and the hash only needs a thumbnail
+    image = cv2.imread(path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        return None
+    thumb = cv2.resize(image, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(thumb)[:8, :8].flatten()
+    # Median without the DC term, which only carries overall brightness
+    bits = low > np.median(low[1:])
+    return np.packbits(bits).tobytes()
+
+
+def _hash_one(rel_path):
+    return perceptual_hash(os.path.join(HERE, rel_path))
+
+
+def hash_images(rel_paths, workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_hash_one, rel_paths, chunksize=64))
+
+
+def near_duplicate_pairs(hashes, threshold, block=256):
+    """Index pairs (i < j) of (N, 8) uint8 hashes within `threshold` bits, in blocks"""
+    pairs = []
+    for start in range(0, len(hashes), block):
+        chunk = hashes[start:start + block]
+        distance = _POPCOUNT[chunk[:, None, :] ^ hashes[None, :, :]].sum(axis=-1, dtype=np.uint16)
+        i, j = np.nonzero(distance <= threshold)
+        i += start
+        upper = i < j
+        pairs.append(np.column_stack([i[upper], j[upper]]))
+    return np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.int64)
+
+
+def cluster(n, pairs):
+    """Connected components (union-find) over the near-duplicate pairs; returns a root per item"""
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)])
+
+
+def build_manifest(images, hashes, threshold):
+    readable = [i for i, h in enumerate(hashes) if h is not None]
+    packed = np.frombuffer(b"".join(hashes[i] for i in readable), dtype=np.uint8).reshape(-1, 8)
+    roots = cluster(len(readable), near_duplicate_pairs(packed, threshold))
+
+    groups = {}
+    for k, root in enumerate(roots):
+        groups.setdefault(root, []).append(readable[k])
+
+    clusters, skip = [], []
+    leakage = Counter()
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        rel = [images[i] for i in members]
+        keep = {}
+        for path, split, label in sorted(rel, key=lambda m: (_SPLIT_PRIORITY[m[1]], m[0])):
+            keep.setdefault(label, path)
+        skip.extend(path for path, _, _ in rel if path not in keep.values())
+        splits = sorted({split for _, split, _ in rel})
+        if len(splits) > 1:
+            leakage["/".join(splits)] += 1
+        clusters.append({
+            "members": [path for path, _, _ in rel],
+            "keep": sorted(keep.values()),
+            "splits": splits,
+            "labels": sorted(keep),
+        })
+
+    return {
+        "version": 1,
+        "hash": "dct64",
+        "threshold": threshold,
+        "images": len(images),
+        "unreadable": [images[i][0] for i, h in enumerate(hashes) if h is None],
+        "clusters": clusters,
+        "skip": sorted(skip),
+        "leakage": dict(leakage),
+        "label_conflicts": sum(1 for c in clusters if len(c["labels"]) > 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate images in the dataset")
+    parser.add_argument("-o", "--output", default=MANIFEST_PATH)
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help="Max differing hash bits (of 64) for two images to be duplicates")
+    parser.add_argument("--workers", type=int, default=None, help="Hashing processes (default: CPU count)")
+    args = parser.parse_args()
+
+    images = list_images()
+    if not images:
+        print("⚠️ No images found, run organize_dataset.py first")
+        return
+
+    started = time.perf_counter()
+    hashes = hash_images([path for path, _, _ in images], args.workers)
+    print(f"✅ Hashed {len(images)} images in {time.perf_counter() - started:.1f}s")
+
+    manifest = build_manifest(images, hashes, args.threshold)
+    with open(args.output, "w") as f:
+        json.dump(manifest, f, indent=1)
+
+    per_split = Counter(path.split("/", 1)[0] for path in manifest["skip"])
+    print(f"📊 {len(manifest['clusters'])} duplicate clusters, {len(manifest['skip'])} images skipped "
+          f"({', '.join(f'{split}: {n}' for split, n in sorted(per_split.items())) or 'none'})")
+    if manifest["leakage"]:
+        print("⚠️ Near-duplicates across splits (train/test leakage):")
+        for splits, n in sorted(manifest["leakage"].items()):
+            print(f"   {splits:20} {n} clusters")
+    if manifest["label_conflicts"]:
+        print(f"⚠️ {manifest['label_conflicts']} clusters have conflicting labels, check them by hand")
+    if manifest["unreadable"]:
+        print(f"⚠️ {len(manifest['unreadable'])} images could not be read")
+    print(f"\n🎯 Manifest saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ import csv
 import mediapipe as mp
 import cv2
 
+from pose_features import FEATURE_COLUMNS
+from dedupe_dataset import load_skip_list, relative_path
+
 # Path to your organized dataset folder
 HERE = os.path.dirname(os.path.abspath(__file__))
 BASE_PATH = HERE
@@ -34,6 +37,9 @@ def extract_landmarks(image_path, pose):
 
 def main():
     header_written = False
+    # Near-duplicates found by dedupe_dataset.py (empty if it hasn't been run)
+    skip = load_skip_list()
+    skipped = 0
 
     with mp.solutions.pose.Pose(static_image_mode=True, min_detection_confidence=0.5) as pose, \
          open(CSV_FILE, mode='w', newline='') as f:
@@ -54,19 +60,25 @@ def main():
                         continue
 
                     img_path = os.path.join(pose_folder, img_name)
+                    if relative_path(img_path) in skip:
+                        skipped += 1
+                        continue
                     landmarks = extract_landmarks(img_path, pose)
                     if landmarks is None:
                         continue
 
                     if not header_written:
-                        header = [f"{i}_{axis}" for i in range(1, 34) for axis in ["x", "y", "z", "v"]]
-                        header.append("label")
+                        # Raw landmarks are stored; engineered features are derived from them
+                        # at training time (see pose_features.py)
+                        header = FEATURE_COLUMNS + ["label"]
                         writer.writerow(header)
                         header_written = True
 
                     writer.writerow(landmarks + [pose_name])
                     print(f"✅ Processed {img_name} → {pose_name}")
 
+    if skipped:
+        print(f"\n⏭️ Skipped {skipped} near-duplicate images listed in the dedupe manifest")
     print(f"\n🎯 Landmarks saved to {CSV_FILE}")
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+"""
+Compact binary landmark traces for camera-free replay and benchmarking.
+
+File layout (little endian):
+    header  : magic b"SNTRACE\\0", version (uint16), reserved (uint16),
+              frame width (uint32), frame height (uint32)
+    records : timestamp (float64 seconds) + session key (uint64) + 33x4
+              float32 landmark block (x, y, z, visibility); frames without
+              a detected pose are stored as all-NaN blocks
+
+The session key is a hash of the client's session id (0 when there is
+none), so a trace recorded by the API server can be split back into one
+stream per client without storing the ids themselves. Version 1 traces
+(no session key) are still read, as a single session.
+
+Records have a fixed size, so a whole trace loads with a single np.fromfile.
+"""
+
+import hashlib
+import struct
+import threading
+
+import numpy as np
+
+from pose_pipeline import NUM_LANDMARKS
+
+TRACE_MAGIC = b"SNTRACE\0"
+TRACE_VERSION = 2
+HEADER = struct.Struct("<8sHHII")
+RECORD_DTYPE = np.dtype([("t", "<f8"), ("session", "<u8"), ("landmarks", "<f4", (NUM_LANDMARKS, 4))])
+RECORD_DTYPES = {
+    1: np.dtype([("t", "<f8"), ("landmarks", "<f4", (NUM_LANDMARKS, 4))]),
+    2: RECORD_DTYPE,
+}
+
+_EMPTY_LANDMARKS = np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+
+
+def session_key(session):
+    """Stable non-zero 64-bit key for a session id; 0 for None"""
+    if session is None:
+        return 0
+    digest = hashlib.blake2b(str(session).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class TraceWriter:
+    """Append-only trace writer; safe to share between request threads"""
+
+    def __init__(self, path, width=0, height=0):
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, width, height))
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._lock = threading.Lock()
+
+    def write(self, timestamp, landmarks, session=None):
+        """Append one frame; pass landmarks=None when no pose was detected"""
+        key = session_key(session)
+        with self._lock:
+            self._record["t"] = timestamp
+            self._record["session"] = key
+            self._record["landmarks"] = _EMPTY_LANDMARKS if landmarks is None else landmarks
+            self._file.write(self._record.tobytes())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(path):
+    """
+    Load a trace file.
+    Returns (header, records) where header is a dict with version, width and
+    height, and records is a structured array with fields "t" and "landmarks".
+    """
+    with open(path, "rb") as f:
+        magic, version, _, width, height = HEADER.unpack(f.read(HEADER.size))
+    if magic != TRACE_MAGIC:
+        raise ValueError(f"{path} is not a landmark trace")
+    if version not in RECORD_DTYPES:
+        raise ValueError(f"Unsupported trace version {version} in {path}")
+
+    records = np.fromfile(path, dtype=RECORD_DTYPES[version], offset=HEADER.size)
+    if version == 1:
+        upgraded = np.zeros(len(records), dtype=RECORD_DTYPE)
+        upgraded["t"], upgraded["landmarks"] = records["t"], records["landmarks"]
+        records = upgraded
+    return {"version": version, "width": width, "height": height}, records
+
+
+def split_sessions(records):
+    """{session key: that session's records, in recorded order}"""
+    keys, first = np.unique(records["session"], return_index=True)
+    return {int(key): records[records["session"] == key] for key in keys[np.argsort(first)]}
+
+
+def detected_mask(records):
+    """Boolean mask of the records that hold a detected pose"""
+    return ~np.isnan(records["landmarks"][:, 0, 0])
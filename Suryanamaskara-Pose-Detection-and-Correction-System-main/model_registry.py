@@ -0,0 +1,156 @@
+"""
+Versioned pose classifier models.
+
+Every trained or incrementally updated model is written once as
+models/pose_classifier_rf.vNNNN.pkl and recorded in models/registry.json
+together with its held-out accuracy and where it came from. The held-out
+rows it was scored on are kept as models/holdout.vNNNN.npz and shared by
+the versions derived from it, so later versions are compared on exactly
+the same frames even after pose_landmarks.csv changes. The current
+version is also copied to pose_classifier_rf.pkl, so scripts that load
+MODEL_PATH keep working unchanged.
+
+Usage:
+    python model_registry.py                 # list versions
+    python model_registry.py --promote 3     # make version 3 current (rollback)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+
+from pose_pipeline import HERE, MODEL_PATH, load_model
+
+MODELS_DIR = os.path.join(HERE, "models")
+REGISTRY_PATH = os.path.join(MODELS_DIR, "registry.json")
+
+
+def _atomic_write(path, write):
+    """Write via a temporary file and rename, so readers never see a partial file"""
+    tmp = f"{path}.tmp{os.getpid()}"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def load_registry(path=REGISTRY_PATH):
+    if not os.path.exists(path):
+        return {"current": None, "versions": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_registry(registry, path=REGISTRY_PATH):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(registry, f, indent=2)
+    _atomic_write(path, write)
+
+
+def version_path(entry):
+    return os.path.join(MODELS_DIR, entry["file"])
+
+
+def get_version(registry, version):
+    for entry in registry["versions"]:
+        if entry["version"] == version:
+            return entry
+    raise KeyError(f"Unknown model version {version}")
+
+
+def promote(version):
+    """Make `version` the current model, copying it over MODEL_PATH"""
+    registry = load_registry()
+    entry = get_version(registry, version)
+    _atomic_write(MODEL_PATH, lambda tmp: shutil.copyfile(version_path(entry), tmp))
+    registry["current"] = version
+    _save_registry(registry)
+    return entry
+
+
+def save_version(model, make_current=True, holdout=None, **metadata):
+    """
+    Write `model` as the next version and record `metadata` (accuracy,
+    source, ...) for it. `holdout` is either the (X, y) held-out split the
+    model was scored on, saved alongside it, or the holdout file name of the
+    version it was derived from. Returns the registry entry.
+    """
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    registry = load_registry()
+    version = max((e["version"] for e in registry["versions"]), default=0) + 1
+    entry = {
+        "version": version,
+        "file": f"pose_classifier_rf.v{version:04d}.pkl",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parent": registry["current"],
+        "feature_set": getattr(model, "feature_set_", "raw"),
+        "n_estimators": len(getattr(model, "estimators_", [])),
+        **metadata,
+    }
+    if isinstance(holdout, str):
+        entry["holdout"] = holdout
+    elif holdout is not None:
+        X, y = holdout
+        entry["holdout"] = f"holdout.v{version:04d}.npz"
+
+        def write_holdout(tmp):
+            with open(tmp, "wb") as f:
+                np.savez(f, X=np.asarray(X, dtype=np.float32), y=np.asarray(y).astype(str))
+        _atomic_write(os.path.join(MODELS_DIR, entry["holdout"]), write_holdout)
+    _atomic_write(version_path(entry), lambda tmp: joblib.dump(model, tmp))
+    registry["versions"].append(entry)
+    _save_registry(registry)
+    if make_current:
+        promote(version)
+    return entry
+
+
+def load_version(version=None):
+    """
+    Load a registered model (the current one by default) as (model, entry).
+    Before anything has been registered, MODEL_PATH is loaded with entry None.
+    """
+    registry = load_registry()
+    version = version if version is not None else registry["current"]
+    if version is None:
+        return load_model(MODEL_PATH), None
+    entry = get_version(registry, version)
+    return load_model(version_path(entry)), entry
+
+
+def load_holdout(entry):
+    """(X, y) held-out split recorded for a version, or None for older versions"""
+    if not entry or not entry.get("holdout"):
+        return None
+    with np.load(os.path.join(MODELS_DIR, entry["holdout"]), allow_pickle=False) as data:
+        return data["X"], data["y"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or promote versioned pose models")
+    parser.add_argument("--promote", type=int, metavar="VERSION", help="Make VERSION the current model")
+    args = parser.parse_args()
+
+    if args.promote is not None:
+        entry = promote(args.promote)
+        print(f"✅ Version {entry['version']} is now current ({entry['file']})")
+        return
+
+    registry = load_registry()
+    if not registry["versions"]:
+        print("⚠️ No registered models yet, run train_pose_model.py first")
+        return
+    for entry in registry["versions"]:
+        marker = "*" if entry["version"] == registry["current"] else " "
+        accuracy = entry.get("accuracy")
+        accuracy = f"{accuracy:.4f}" if accuracy is not None else "   -  "
+        print(f"{marker} v{entry['version']:<4} {entry['created']}  {entry.get('source', ''):12} "
+              f"acc {accuracy}  {entry['n_estimators']:>4} trees  parent {entry['parent']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Hot reload of the pose classifier for the API server.
+
+A background thread polls models/registry.json (see model_registry.py) and
+reference_stats.npz. When a new current version appears it is loaded,
+warmed up with a test inference over the reference poses (rejected if it
+gets too few of them right) and swapped in with a single reference
+assignment. Handlers read `reloader.model` once per
+request, so every request is served by one model from start to end and no
+request is ever blocked by a reload. The previously active model stays in
+memory for an instant rollback.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+import model_registry
+from pose_pipeline import MODEL_PATH, REF_PATH, model_features, classify, normalize_pose_name
+from reference_stats import load_reference_stats
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class _Active:
+    """A loaded model with its registry entry, swapped in as one reference"""
+    __slots__ = ("model", "entry", "loaded_at", "warmup")
+
+    def __init__(self, model, entry, warmup):
+        self.model = model
+        self.entry = entry
+        self.loaded_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.warmup = warmup
+
+    @property
+    def version(self):
+        return self.entry["version"] if self.entry else None
+
+
+class ModelReloader:
+    def __init__(self, wrap=None, poll_interval_s=2.0, min_reference_agreement=0.5):
+        # wrap(forest) -> served model, e.g. the cascade around the forest
+        self.wrap = wrap or (lambda model: model)
+        self.poll_interval_s = poll_interval_s
+        # New versions classifying fewer reference poses correctly than this are not swapped in
+        self.min_reference_agreement = min_reference_agreement
+
+        # Serializes loads, swaps and rollbacks; never taken by request handlers
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.reference = load_reference_stats()
+        self._ref_mtime = _mtime(REF_PATH)
+        self._fingerprint = self._current_fingerprint()
+        # The startup model passes the same warm-up and agreement gate as every reload
+        self._active = self._load(self._fingerprint)
+        self._previous = None
+        self._failed_fingerprint = None
+
+        self._reloads = 0
+        self._rollbacks = 0
+        self._failures = 0
+        self._last_error = None
+
+    @property
+    def model(self):
+        return self._active.model
+
+    @property
+    def version(self):
+        return self._active.version
+
+    def _current_fingerprint(self):
+        """Registered current version, or the mtime of MODEL_PATH before anything is registered"""
+        current = model_registry.load_registry()["current"]
+        return current if current is not None else ("mtime", _mtime(MODEL_PATH))
+
+    def _load(self, fingerprint):
+        """Load, warm and check a model; raises if it can't serve or misses the agreement gate"""
+        version = fingerprint if isinstance(fingerprint, int) else None
+        model, entry = model_registry.load_version(version)
+        active = self._warm(self.wrap(model), entry)
+        agreement = active.warmup["reference_agreement"]
+        if agreement < self.min_reference_agreement:
+            raise ValueError(f"Model version {active.version}: reference agreement {agreement} "
+                             f"is below {self.min_reference_agreement}")
+        return active
+
+    def _warm(self, model, entry):
+        """Test inference on the reference poses; raises if the model can't serve"""
+        frames = self.reference.reference_frames()
+        started = time.perf_counter()
+        labels, raw_confidences = classify(model, model_features(model, frames))
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if hasattr(model, "reset_stats"):
+            model.reset_stats()  # keep warm-up frames out of the serving stats
+        if len(labels) != len(frames) or not np.all(np.isfinite(raw_confidences)):
+            raise ValueError("Test inference returned malformed predictions")
+        expected = [normalize_pose_name(name) for name in self.reference.poses]
+        agreement = np.mean([normalize_pose_name(str(label)) == name
+                             for label, name in zip(labels, expected)])
+        return _Active(model, entry, {
+            "frames": len(frames),
+            "ms": round(elapsed_ms, 2),
+            "reference_agreement": round(float(agreement), 4),
+        })
+
+    def check(self):
+        """Swap in a new current version (and reload the reference poses) if changed"""
+        fingerprint = self._current_fingerprint()
+        ref_mtime = _mtime(REF_PATH)
+        if ref_mtime == self._ref_mtime and fingerprint in (self._fingerprint, self._failed_fingerprint):
+            return False
+
+        with self._lock:
+            if ref_mtime != self._ref_mtime:
+                self.reference = load_reference_stats()
+                self._ref_mtime = ref_mtime
+            if fingerprint in (self._fingerprint, self._failed_fingerprint):
+                return False
+            try:
+                active = self._load(fingerprint)
+            except Exception as e:
+                # Keep serving the current model; don't retry this version until it changes
+                self._failed_fingerprint = fingerprint
+                self._failures += 1
+                self._last_error = f"{fingerprint}: {e}"
+                print(f"⚠️ Model reload failed, keeping version {self.version}: {e}")
+                return False
+            self._previous, self._active = self._active, active
+            self._fingerprint = fingerprint
+            self._reloads += 1
+        print(f"✅ Model version {active.version} loaded and warmed "
+              f"({active.warmup['ms']}ms, reference agreement {active.warmup['reference_agreement']})")
+        return True
+
+    def rollback(self):
+        """Swap the previous model back in and make it current in the registry"""
+        with self._lock:
+            if self._previous is None:
+                raise ValueError("No previous model to roll back to")
+            self._active, self._previous = self._previous, self._active
+            if self._active.entry is not None:
+                model_registry.promote(self._active.version)
+            # Don't let the watcher swap the rolled back version in again
+            self._fingerprint = self._current_fingerprint()
+            self._rollbacks += 1
+            return self._active.version
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                self.check()
+            except Exception as e:
+                self._last_error = str(e)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-reload", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def metrics(self):
+        active, previous = self._active, self._previous
+        return {
+            "version": active.version,
+            "file": active.entry["file"] if active.entry else os.path.basename(MODEL_PATH),
+            "loaded_at": active.loaded_at,
+            "warmup": active.warmup,
+            "previous_version": previous.version if previous else None,
+            "watching": self._thread is not None and not self._stop.is_set(),
+            "reloads": self._reloads,
+            "rollbacks": self._rollbacks,
+            "failures": self._failures,
+            "last_error": self._last_error,
+        }
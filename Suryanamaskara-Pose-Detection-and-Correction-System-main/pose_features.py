@@ -0,0 +1,121 @@
+"""
+Feature sets for the pose classifier.
+
+"raw"        - the 132 MediaPipe values (x, y, z, visibility for 33 landmarks)
+"engineered" - body landmarks only (face and hand detail dropped), centered on
+               the shoulder/hip center and scale-normalized by torso length,
+               plus joint angles and torso tilt; invariant to where the user
+               stands and how far they are from the camera
+
+A trained model records the set it expects in its `feature_set_` attribute;
+models without one are raw-feature models.
+"""
+
+import mediapipe as mp
+import numpy as np
+
+PL = mp.solutions.pose.PoseLandmark
+
+NUM_LANDMARKS = 33
+FEATURE_COLUMNS = [f"{i}_{c}" for i in range(1, 34) for c in ["x", "y", "z", "v"]]
+
+# Nose, shoulders, elbows, wrists, hips, knees, ankles, heels, feet
+BODY_LANDMARKS = [PL.NOSE.value] + list(range(PL.LEFT_SHOULDER.value, PL.LEFT_PINKY.value)) + \
+    list(range(PL.LEFT_HIP.value, NUM_LANDMARKS))
+
+BODY_ANGLES = {
+    "left_elbow": (PL.LEFT_SHOULDER.value, PL.LEFT_ELBOW.value, PL.LEFT_WRIST.value),
+    "right_elbow": (PL.RIGHT_SHOULDER.value, PL.RIGHT_ELBOW.value, PL.RIGHT_WRIST.value),
+    "left_knee": (PL.LEFT_HIP.value, PL.LEFT_KNEE.value, PL.LEFT_ANKLE.value),
+    "right_knee": (PL.RIGHT_HIP.value, PL.RIGHT_KNEE.value, PL.RIGHT_ANKLE.value),
+    "left_hip": (PL.LEFT_SHOULDER.value, PL.LEFT_HIP.value, PL.LEFT_KNEE.value),
+    "right_hip": (PL.RIGHT_SHOULDER.value, PL.RIGHT_HIP.value, PL.RIGHT_KNEE.value),
+    "left_shoulder": (PL.LEFT_HIP.value, PL.LEFT_SHOULDER.value, PL.LEFT_ELBOW.value),
+    "right_shoulder": (PL.RIGHT_HIP.value, PL.RIGHT_SHOULDER.value, PL.RIGHT_ELBOW.value),
+}
+
+ENGINEERED_FEATURE_COLUMNS = (
+    [f"{i + 1}_{c}" for i in BODY_LANDMARKS for c in ["nx", "ny", "nz", "v"]] +
+    [f"{name}_angle" for name in BODY_ANGLES] +
+    ["torso_tilt"]
+)
+FEATURE_SETS = ("raw", "engineered")
+
+
+def joint_angles(landmarks, triplets, frame_size=None):
+    """
+    Angles (degrees, 0-180) at b for each (a, b, c) landmark index triplet,
+    for (33, 4) or (N, 33, 4) landmarks. Measured in normalized image space,
+    or in pixel space when frame_size=(width, height) is given.
+    Returns an array of shape (..., len(triplets)).
+    """
+    lm = np.asarray(landmarks, dtype=np.float64)
+    xy = lm[..., :2]
+    if frame_size is not None:
+        xy = xy * np.asarray(frame_size, dtype=np.float64)
+    triplets = np.asarray(triplets)
+    a = xy[..., triplets[:, 0], :]
+    b = xy[..., triplets[:, 1], :]
+    c = xy[..., triplets[:, 2], :]
+    radians = (np.arctan2(c[..., 1] - b[..., 1], c[..., 0] - b[..., 0]) -
+               np.arctan2(a[..., 1] - b[..., 1], a[..., 0] - b[..., 0]))
+    angles = np.abs(radians * 180.0 / np.pi)
+    return np.where(angles > 180.0, 360.0 - angles, angles)
+
+
+def _torso(lm):
+    """Shoulder/hip center, shoulder-mid minus hip-mid vector and torso length"""
+    shoulders = (lm[..., PL.LEFT_SHOULDER.value, :2] + lm[..., PL.RIGHT_SHOULDER.value, :2]) / 2.0
+    hips = (lm[..., PL.LEFT_HIP.value, :2] + lm[..., PL.RIGHT_HIP.value, :2]) / 2.0
+    center = (shoulders + hips) / 2.0
+    torso = shoulders - hips
+    return center, torso, np.linalg.norm(torso, axis=-1) + 1e-6
+
+
+def body_center(landmarks):
+    """(N, 2) mean of the shoulders and hips for (N, 33, 4) landmarks"""
+    return _torso(np.asarray(landmarks, dtype=np.float32))[0]
+
+
+def normalize_landmarks(landmarks, scale=False):
+    """
+    Center x, y on the mean of the shoulders and hips (from real_ex.py);
+    with scale=True, x, y and z are also divided by the torso length.
+    Accepts flat (132,), (33, 4) or (N, 33, 4) input and returns the same shape.
+    """
+    arr = np.array(landmarks, dtype=np.float32)
+    lm = arr.reshape(-1, NUM_LANDMARKS, 4)
+    center, _, torso_len = _torso(lm)
+    lm[..., :2] -= center[:, None, :]
+    if scale:
+        lm[..., :3] /= torso_len[:, None, None]
+    return arr
+
+
+def torso_tilt(landmarks):
+    """Torso angle from vertical in degrees: 0 upright, 90 horizontal, 180 inverted"""
+    _, torso, torso_len = _torso(np.asarray(landmarks, dtype=np.float64))
+    # image y grows downwards, so "up" is -y
+    return np.degrees(np.arccos(np.clip(-torso[..., 1] / torso_len, -1.0, 1.0)))
+
+
+def engineered_features(landmarks):
+    """Compute the (N, len(ENGINEERED_FEATURE_COLUMNS)) engineered feature matrix"""
+    lm = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4)
+    body = normalize_landmarks(lm, scale=True)[:, BODY_LANDMARKS, :]
+    return np.column_stack([
+        body.reshape(len(lm), -1),
+        joint_angles(lm, list(BODY_ANGLES.values())),
+        torso_tilt(lm),
+    ]).astype(np.float32)
+
+
+def model_feature_set(model):
+    return getattr(model, "feature_set_", "raw")
+
+
+def model_features(model, landmarks):
+    """Build the input matrix `model` was trained on from (33, 4) or (N, 33, 4) landmarks"""
+    if model_feature_set(model) == "engineered":
+        return engineered_features(landmarks)
+    return np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS * 4)
@@ -0,0 +1,336 @@
+"""
+Shared, side-effect free pieces of the pose pipeline.
+
+Used by the Flask API server and the offline tools so that every path
+classifies poses and applies the angle rules in exactly the same way.
+Landmarks are passed around as float32 arrays of shape (33, 4) holding
+x, y, z, visibility (or (N, 33, 4) for batches).
+"""
+
+import base64
+import os
+
+import cv2
+import joblib
+import mediapipe as mp
+import numpy as np
+
+from pose_features import NUM_LANDMARKS, FEATURE_COLUMNS, joint_angles, model_features
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(HERE, "pose_classifier_rf.pkl")
+REF_PATH = os.path.join(HERE, "reference_stats.npz")
+
+mp_pose = mp.solutions.pose
+PL = mp_pose.PoseLandmark
+
+# Angle-based corrections dictionary (from correc.py)
+POSE_CORRECTIONS_ANGLES = {
+    "pranamasana": {
+        "elbow_angle": (170, 190, "Keep arms straight together"),
+    },
+    "hasta_utthanasana": {
+        "elbow_angle": (170, 190, "Arms straight up"),
+        "back_angle": (190, 230, "Arch back slightly"),
+    },
+    "padahastasana": {
+        "hip_angle": (50, 100, "Bend forward fully"),
+    },
+    "ashwa_sanchalanasana": {
+        "front_knee": (80, 100, "Bend front knee to ~90°"),
+        "back_leg": (160, 190, "Keep back leg straight"),
+    },
+    "kumbhakasana": {
+        "body_line": (160, 180, "Keep body straight like plank"),
+    },
+    "ashtanga_namaskara": {
+        "elbow_angle": (80, 110, "Bend elbows ~90°"),
+    },
+    "bhujangasana": {
+        "back_angle": (90, 120, "Lift chest higher"),
+        "elbow_angle": (160, 190, "Keep arms straight"),
+    },
+    "adho_mukh_svanasana": {
+        "hip_angle": (70, 110, "Push hips up to form inverted V"),
+    },
+}
+
+# Landmark triplets (a, b, c) measured by each angle check, angle taken at b
+ANGLE_CHECKS = {
+    "elbow_angle": (PL.LEFT_SHOULDER.value, PL.LEFT_ELBOW.value, PL.LEFT_WRIST.value),
+    "front_knee": (PL.LEFT_HIP.value, PL.LEFT_KNEE.value, PL.LEFT_ANKLE.value),
+    "hip_angle": (PL.LEFT_SHOULDER.value, PL.LEFT_HIP.value, PL.LEFT_ANKLE.value),
+    "back_angle": (PL.LEFT_HIP.value, PL.LEFT_SHOULDER.value, PL.LEFT_WRIST.value),
+    "body_line": (PL.LEFT_SHOULDER.value, PL.LEFT_HIP.value, PL.LEFT_ANKLE.value),
+    "back_leg": (PL.LEFT_HIP.value, PL.LEFT_KNEE.value, PL.LEFT_ANKLE.value),
+}
+ANGLE_NAMES = list(ANGLE_CHECKS)
+
+# Basic descriptions for fallback
+POSE_CORRECTIONS = {
+    "Pranamasana": {
+        "description": "Prayer Pose - Stand with palms together at chest",
+        "corrections": [
+            "Keep your palms together at chest level",
+            "Stand straight with feet together",
+            "Relax your shoulders"
+        ]
+    },
+    "Hasta Utthanasana": {
+        "description": "Raised Arms - Arms up, arch back slightly",
+        "corrections": [
+            "Raise arms straight up",
+            "Arch your back slightly",
+            "Look up at your hands"
+        ]
+    },
+    "Padahastasana": {
+        "description": "Forward Bend - Touch toes, bend forward",
+        "corrections": [
+            "Bend forward from the hips",
+            "Try to touch your toes",
+            "Keep your legs straight"
+        ]
+    },
+    "Ashwa Sanchalanasana": {
+        "description": "Lunge - One leg back, knee down",
+        "corrections": [
+            "Step one leg back",
+            "Keep front knee at 90 degrees",
+            "Look up and arch your back"
+        ]
+    },
+    "Kumbhakasana": {
+        "description": "Plank - Straight body like a plank",
+        "corrections": [
+            "Keep body straight like a plank",
+            "Don't let hips sag",
+            "Engage your core"
+        ]
+    },
+    "Ashtanga Namaskara": {
+        "description": "Eight Point Pose - Chest and knees down",
+        "corrections": [
+            "Lower chest and knees to ground",
+            "Keep hips raised",
+            "Chin should touch the ground"
+        ]
+    },
+    "Bhujangasana": {
+        "description": "Cobra - Chest up, arms straight",
+        "corrections": [
+            "Lift chest up",
+            "Keep elbows slightly bent",
+            "Look upward"
+        ]
+    },
+    "Adho Mukh Svanasana": {
+        "description": "Downward Dog - Inverted V shape",
+        "corrections": [
+            "Form an inverted V shape",
+            "Push hips up and back",
+            "Keep heels down"
+        ]
+    }
+}
+
+
+def load_model(path=MODEL_PATH):
+    """Load the trained pose classifier"""
+    return joblib.load(path)
+
+
+def create_pose(model_complexity=1, static_image_mode=False):
+    """Create a MediaPipe Pose tracker with the project's default thresholds"""
+    return mp_pose.Pose(
+        static_image_mode=static_image_mode,
+        model_complexity=model_complexity,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def decode_image(image_str):
+    """Decode a base64 (optionally data-URL prefixed) image into a BGR frame"""
+    # Remove data URL prefix if present
+    if ',' in image_str:
+        image_str = image_str.split(',')[1]
+
+    image_data = base64.b64decode(image_str)
+    nparr = np.frombuffer(image_data, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def landmarks_to_array(pose_landmarks):
+    """Convert MediaPipe pose landmarks into a (33, 4) float32 array"""
+    if pose_landmarks is None:
+        return None
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+        dtype=np.float32
+    )
+
+
+def parse_landmarks(data):
+    """
+    Parse client-supplied landmarks into a (33, 4) float32 array.
+    Accepts nested lists ([[x, y, z, visibility], ...]) or the packed
+    little-endian float32 layout (528 bytes). Raises ValueError when invalid.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        if len(data) != NUM_LANDMARKS * 4 * 4:
+            raise ValueError(f"Packed landmarks must be {NUM_LANDMARKS * 4 * 4} bytes, got {len(data)}")
+        landmarks = np.frombuffer(data, dtype="<f4").reshape(NUM_LANDMARKS, 4).astype(np.float32)
+    else:
+        try:
+            landmarks = np.asarray(data, dtype=np.float32)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Landmarks must be numeric: {e}") from e
+        if landmarks.shape != (NUM_LANDMARKS, 4):
+            raise ValueError(f"Landmarks must have shape ({NUM_LANDMARKS}, 4), got {landmarks.shape}")
+    if not np.isfinite(landmarks).all():
+        raise ValueError("Landmarks contain NaN or infinite values")
+    return landmarks
+
+
+def normalize_pose_name(name):
+    return name.strip().lower().replace(" ", "_")
+
+
+def display_pose_name(name):
+    return " ".join(word.capitalize() for word in name.split())
+
+
+def classify(model, features):
+    """
+    Classify a (N, 132) feature matrix.
+    Returns (labels, raw_confidences); a single predict_proba pass is used
+    since the forest's predict() is just the argmax of it.
+    """
+    probabilities = model.predict_proba(features)
+    best = np.argmax(probabilities, axis=1)
+    labels = model.classes_[best]
+    raw_confidences = probabilities[np.arange(len(best)), best]
+    return labels, raw_confidences
+
+
+def boost_confidence(raw_confidence):
+    """
+    Boost confidence to make it more lenient.
+    Formula: new_conf = 0.6 + (raw_conf * 0.55), capped at 0.99
+    """
+    return min(0.6 + (float(raw_confidence) * 0.55), 0.99)
+
+
+def calculate_angles(landmarks, names=ANGLE_NAMES, frame_size=None):
+    """
+    Compute the correction angles (degrees) for (33, 4) or (N, 33, 4) landmarks.
+    Returns an array of shape (..., len(names)).
+    """
+    return joint_angles(landmarks, [ANGLE_CHECKS[name] for name in names], frame_size)
+
+
+def failed_checks(pose_name, angles):
+    """Return (check, angle, message) for every angle rule of the pose that is violated"""
+    rules = POSE_CORRECTIONS_ANGLES.get(normalize_pose_name(pose_name), {})
+    failed = []
+    for check, (low, high, message) in rules.items():
+        angle = angles[ANGLE_NAMES.index(check)]
+        if not (low <= angle <= high):
+            failed.append((check, angle, message))
+    return failed
+
+
+def check_pose_corrections(pose_name, landmarks, angles=None):
+    """
+    Check angle-based corrections for a pose (from correc.py)
+    Returns list of correction feedback messages
+    """
+    if normalize_pose_name(pose_name) not in POSE_CORRECTIONS_ANGLES:
+        return []
+
+    if angles is None:
+        angles = calculate_angles(landmarks)
+
+    return [f"{message} (angle: {int(angle)}°)"
+            for _, angle, message in failed_checks(pose_name, angles)]
+
+
+class SequenceTracker:
+    """
+    Smoothing and hold logic that walks the user through a pose order
+    (shared by correc.py, real_ex.py and the trace replay driver).
+    """
+
+    def __init__(self, pose_order, consistent_frames_required=5, hold_frames=15):
+        self.pose_order = list(pose_order)
+        self.consistent_frames_required = consistent_frames_required
+        self.hold_frames = hold_frames
+        self.current_pose_idx = 0
+        self.stable_ok_frames = 0
+        self.consistent_predicted_pose = None
+        self.consistent_count = 0
+
+    @property
+    def finished(self):
+        return self.current_pose_idx >= len(self.pose_order)
+
+    @property
+    def target_pose(self):
+        return None if self.finished else self.pose_order[self.current_pose_idx]
+
+    def update(self, predicted_pose_norm):
+        """Feed one normalized prediction; returns True when the target pose was completed"""
+        if predicted_pose_norm == self.consistent_predicted_pose:
+            self.consistent_count += 1
+        else:
+            self.consistent_predicted_pose = predicted_pose_norm
+            self.consistent_count = 1
+
+        if (self.consistent_count >= self.consistent_frames_required and
+                predicted_pose_norm == normalize_pose_name(self.target_pose)):
+            self.stable_ok_frames += 1
+        else:
+            self.stable_ok_frames = 0
+
+        if self.stable_ok_frames >= self.hold_frames:
+            self.current_pose_idx += 1
+            self.stable_ok_frames = 0
+            self.consistent_predicted_pose = None
+            self.consistent_count = 0
+            return True
+        return False
+
+
+def build_prediction(label, raw_confidence, landmarks, angles=None, include_landmarks=True):
+    """Build the /api/predict response body for one classified frame"""
+    # Model returns the pose name directly (string)
+    pose_name = str(label).lower()  # Keep lowercase for matching
+    pose_name_display = display_pose_name(pose_name)
+
+    # Get angle-based corrections from correc.py logic
+    angle_corrections = check_pose_corrections(pose_name, landmarks, angles)
+
+    # Use angle corrections if available, otherwise use basic corrections
+    corrections_info = POSE_CORRECTIONS.get(pose_name_display, {})
+    final_corrections = angle_corrections or corrections_info.get('corrections', [])
+
+    # Add "Good alignment" message if no corrections needed
+    if not angle_corrections and pose_name:
+        alignment_status = "✔ Good Alignment"
+    else:
+        alignment_status = "Adjust your pose"
+
+    response = {
+        'success': True,
+        'pose': pose_name,
+        'pose_display': pose_name_display,
+        'confidence': boost_confidence(raw_confidence),
+        'description': corrections_info.get('description', ''),
+        'corrections': final_corrections,
+        'alignment_status': alignment_status,
+        'has_angle_corrections': len(angle_corrections) > 0,
+    }
+    if include_landmarks:
+        response['landmarks'] = np.asarray(landmarks).tolist()
+    return response
@@ -2,25 +2,20 @@
 import os
 import cv2
 import joblib
-import pickle
 import numpy as np
-import pandas as pd
 import mediapipe as mp
+import time
+import argparse
+
+from pose_pipeline import SequenceTracker, landmarks_to_array, model_features
+from landmark_trace import TraceWriter
+from reference_stats import load_reference_stats
 
 # -------------------- Paths --------------------
 HERE = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(HERE, "pose_classifier_rf.pkl")
-REF_PATH   = os.path.join(HERE, "reference_keypoints.pkl")
-
-# -------------------- Load model & refs --------------------
-model = joblib.load(MODEL_PATH)
-with open(REF_PATH, "rb") as f:
-    reference_keypoints = pickle.load(f)
-
-FEATURE_COLUMNS = [f"{i}_{c}" for i in range(1, 34) for c in ["x", "y", "z", "v"]]
 
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
 mp_drawing = mp.solutions.drawing_utils
 
 # -------------------- Pose order --------------------
@@ -40,35 +35,9 @@ CORRECTION_THRESHOLD = 0.25
 HOLD_FRAMES = 15
 CONSISTENT_FRAMES_REQUIRED = 5
 
-# -------------------- State --------------------
-current_pose_idx = 0
-stable_ok_frames = 0
-consistent_predicted_pose = None
-consistent_count = 0
-
 # -------------------- Helpers --------------------
-def flatten_landmarks(results):
-    if not results.pose_landmarks:
-        return None
-    return np.array(
-        [val for lm in results.pose_landmarks.landmark for val in (lm.x, lm.y, lm.z, lm.visibility)],
-        dtype=np.float32
-    )
-
-def normalize_landmarks(flat):
-    arr = flat.copy()
-    xs = arr[0::4]
-    ys = arr[1::4]
-    L_SH, R_SH = mp_pose.PoseLandmark.LEFT_SHOULDER.value, mp_pose.PoseLandmark.RIGHT_SHOULDER.value
-    L_HP, R_HP = mp_pose.PoseLandmark.LEFT_HIP.value, mp_pose.PoseLandmark.RIGHT_HIP.value
-    x_center = (xs[L_SH] + xs[R_SH] + xs[L_HP] + xs[R_HP]) / 4.0
-    y_center = (ys[L_SH] + ys[R_SH] + ys[L_HP] + ys[R_HP]) / 4.0
-    xs -= x_center
-    ys -= y_center
-    return arr
-
 def _pt(lm, w, h):
-    return np.array([lm.x * w, lm.y * h], dtype=np.float32)
+    return np.array([lm[0] * w, lm[1] * h], dtype=np.float32)
 
 def angle_deg(a, b, c):
     ba = a - b
@@ -77,10 +46,10 @@ def angle_deg(a, b, c):
     cosine = np.clip(np.dot(ba, bc) / denom, -1.0, 1.0)
     return float(np.degrees(np.arccos(cosine)))
 
-def compute_angles(results, frame_shape):
-    """Compute key angles: elbows, knees, hips."""
+def compute_angles(landmarks, frame_shape):
+    """Compute key angles: elbows, knees, hips. `landmarks` is a (33, 4) array."""
     h, w = frame_shape[:2]
-    lm = results.pose_landmarks.landmark
+    lm = landmarks
 
     pts = lambda part: _pt(lm[part], w, h)
     L_HIP, R_HIP = pts(mp_pose.PoseLandmark.LEFT_HIP.value), pts(mp_pose.PoseLandmark.RIGHT_HIP.value)
@@ -125,30 +94,48 @@ def normalize_pose_name(name):
     return name.strip().lower().replace(" ", "_")
 
 # -------------------- Main loop --------------------
-cap = cv2.VideoCapture(0)
-
-while cap.isOpened() and current_pose_idx < len(POSE_ORDER):
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    frame = cv2.flip(frame, 1)
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = pose.process(rgb)
-    display = frame.copy()
-    target_pose = POSE_ORDER[current_pose_idx]
-    target_pose_norm = normalize_pose_name(target_pose)
-
-    if results.pose_landmarks:
-        mp_drawing.draw_landmarks(display, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-        flat = flatten_landmarks(results)
-
-        if flat is not None:
-            X = pd.DataFrame([flat], columns=FEATURE_COLUMNS)
+def main():
+    parser = argparse.ArgumentParser(description="Surya Namaskar detection")
+    parser.add_argument("--record", metavar="TRACE", help="Record a landmark trace of the session")
+    args = parser.parse_args()
+
+    # -------------------- Load model & refs --------------------
+    model = joblib.load(MODEL_PATH)
+    reference = load_reference_stats()
+
+    pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    sequence = SequenceTracker(POSE_ORDER, CONSISTENT_FRAMES_REQUIRED, HOLD_FRAMES)
+
+    cap = cv2.VideoCapture(0)
+    trace = None
+    if args.record:
+        trace = TraceWriter(args.record,
+                            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    while cap.isOpened() and not sequence.finished:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        frame = cv2.flip(frame, 1)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = pose.process(rgb)
+        display = frame.copy()
+        target_pose = sequence.target_pose
+        target_pose_norm = normalize_pose_name(target_pose)
+        landmarks = landmarks_to_array(results.pose_landmarks)
+        if trace:
+            trace.write(time.time(), landmarks)
+
+        if results.pose_landmarks:
+            mp_drawing.draw_landmarks(display, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+            X = model_features(model, landmarks)
+
             predicted_pose = model.predict(X)[0]
             predicted_pose_norm = normalize_pose_name(predicted_pose)
 
-            angles = compute_angles(results, display.shape)
+            angles = compute_angles(landmarks, display.shape)
 
             # --- Rule-based overrides ---
             if target_pose_norm == "kumbhakasana" and plank_rule_override(angles):
@@ -160,39 +147,37 @@ while cap.isOpened() and current_pose_idx < len(POSE_ORDER):
                 predicted_pose = "ashtanga_namaskara"
 
             # --- Smoothing logic ---
-            if predicted_pose_norm == consistent_predicted_pose:
-                consistent_count += 1
-            else:
-                consistent_predicted_pose = predicted_pose_norm
-                consistent_count = 1
+            completed = sequence.update(predicted_pose_norm)
 
-            if consistent_count >= CONSISTENT_FRAMES_REQUIRED and predicted_pose_norm == target_pose_norm:
-                stable_ok_frames += 1
-            else:
-                stable_ok_frames = 0
+            # --- Highlight joints outside the reference tolerance for the target pose ---
+            if predicted_pose_norm == target_pose_norm:
+                off_joints, _ = reference.tolerance_check(target_pose_norm, landmarks)
+                draw_highlight_joints(display, results,
+                                      [mp_pose.PoseLandmark(idx).name for idx in off_joints[0].nonzero()[0]])
 
             # --- Overlay info ---
             cv2.putText(display, f"Target Pose: {target_pose}", (10, 30),
                         cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
             cv2.putText(display, f"Predicted: {predicted_pose}", (10, 65),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
-            cv2.putText(display, f"Holding... {stable_ok_frames}/{HOLD_FRAMES}", (10, 100),
+            cv2.putText(display, f"Holding... {HOLD_FRAMES if completed else sequence.stable_ok_frames}/{HOLD_FRAMES}", (10, 100),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
 
-            if stable_ok_frames >= HOLD_FRAMES:
-                current_pose_idx += 1
-                stable_ok_frames = 0
-                consistent_predicted_pose = None
-                consistent_count = 0
+            if completed:
                 cv2.putText(display, "Great! Next pose ▶", (10, 140),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
                 cv2.imshow("Surya Namaskar", display)
                 cv2.waitKey(700)
 
-    cv2.imshow("Surya Namaskar", display)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+        cv2.imshow("Surya Namaskar", display)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    if trace:
+        trace.close()
+    cap.release()
+    cv2.destroyAllWindows()
 
-cap.release()
-cv2.destroyAllWindows()
 
+if __name__ == "__main__":
+    main()
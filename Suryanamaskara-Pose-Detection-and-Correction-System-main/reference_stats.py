@@ -0,0 +1,174 @@
+"""
+Per-pose reference statistics, built in one streaming pass.
+
+For every pose the builder keeps running (Welford) statistics, so memory
+does not grow with the number of images:
+    mean_raw    - mean x, y, z per landmark in image coordinates
+    mean, cov   - mean and 3x3 covariance per landmark after centering on the
+                  shoulder/hip center and scaling by torso length
+    angle_*     - mean, variance and a 5° histogram of each BODY_ANGLES angle
+
+Everything is stored in one versioned .npz file (no pickle), which loads
+instantly and supports vectorized tolerance checks on (N, 33, 4) landmarks.
+"""
+
+import os
+import pickle
+
+import numpy as np
+
+from pose_features import NUM_LANDMARKS, BODY_LANDMARKS, BODY_ANGLES, joint_angles, normalize_landmarks
+from pose_pipeline import HERE, REF_PATH, normalize_pose_name
+
+FORMAT_VERSION = 1
+LEGACY_REF_PATH = os.path.join(HERE, "reference_keypoints.pkl")
+
+ANGLE_NAMES = list(BODY_ANGLES)
+ANGLE_BINS = np.arange(0.0, 185.0, 5.0)
+# Ridge added to every landmark covariance so near-constant joints don't explode
+COV_EPS = 1e-4
+
+
+class PoseStatsAccumulator:
+    """Streaming statistics of one pose; feed frames with update()"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean_raw = np.zeros((NUM_LANDMARKS, 3))
+        self.mean = np.zeros((NUM_LANDMARKS, 3))
+        self.m2 = np.zeros((NUM_LANDMARKS, 3, 3))
+        self.angle_mean = np.zeros(len(ANGLE_NAMES))
+        self.angle_m2 = np.zeros(len(ANGLE_NAMES))
+        self.angle_hist = np.zeros((len(ANGLE_NAMES), len(ANGLE_BINS) - 1), dtype=np.int64)
+
+    def update(self, landmarks):
+        """Add one (33, 4) frame"""
+        lm = np.asarray(landmarks, dtype=np.float64).reshape(NUM_LANDMARKS, 4)
+        self.count += 1
+        n = self.count
+
+        self.mean_raw += (lm[:, :3] - self.mean_raw) / n
+
+        x = normalize_landmarks(lm, scale=True)[:, :3]
+        delta = x - self.mean
+        self.mean += delta / n
+        self.m2 += np.einsum("ji,jk->jik", delta, x - self.mean)
+
+        angles = joint_angles(lm, list(BODY_ANGLES.values()))
+        delta = angles - self.angle_mean
+        self.angle_mean += delta / n
+        self.angle_m2 += delta * (angles - self.angle_mean)
+        bins = np.clip(np.searchsorted(ANGLE_BINS, angles, side="right") - 1, 0, len(ANGLE_BINS) - 2)
+        self.angle_hist[np.arange(len(ANGLE_NAMES)), bins] += 1
+
+    def cov(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.full_like(self.m2, np.nan)
+
+    def angle_var(self):
+        return self.angle_m2 / (self.count - 1) if self.count > 1 else np.full_like(self.angle_m2, np.nan)
+
+
+def save_reference_stats(accumulators, path=REF_PATH):
+    """Write {pose_name: PoseStatsAccumulator} as one .npz file"""
+    poses = sorted(accumulators)
+    accs = [accumulators[pose] for pose in poses]
+    tmp = f"{path}.tmp{os.getpid()}.npz"
+    np.savez_compressed(
+        tmp,
+        format_version=np.array(FORMAT_VERSION),
+        poses=np.array(poses),
+        angle_names=np.array(ANGLE_NAMES),
+        angle_bins=ANGLE_BINS,
+        count=np.array([acc.count for acc in accs]),
+        mean_raw=np.stack([acc.mean_raw for acc in accs]).astype(np.float32),
+        mean=np.stack([acc.mean for acc in accs]).astype(np.float32),
+        cov=np.stack([acc.cov() for acc in accs]).astype(np.float32),
+        angle_mean=np.stack([acc.angle_mean for acc in accs]).astype(np.float32),
+        angle_var=np.stack([acc.angle_var() for acc in accs]).astype(np.float32),
+        angle_hist=np.stack([acc.angle_hist for acc in accs]).astype(np.int32),
+    )
+    os.replace(tmp, path)
+
+
+class ReferenceStats:
+    def __init__(self, arrays):
+        self.poses = [str(pose) for pose in arrays["poses"]]
+        self.count = arrays["count"]
+        self.mean_raw = arrays["mean_raw"]
+        self.mean = arrays["mean"]
+        self.cov = arrays["cov"]
+        self.angle_mean = arrays["angle_mean"]
+        self.angle_var = arrays["angle_var"]
+        self.angle_hist = arrays.get("angle_hist")
+        self._index = {normalize_pose_name(pose): i for i, pose in enumerate(self.poses)}
+        # Inverse covariances once, so checks are a single einsum
+        regularized = self.cov.astype(np.float64) + COV_EPS * np.eye(3)
+        valid = np.isfinite(regularized).all(axis=(-2, -1))
+        self.precision = np.full_like(regularized, np.nan)
+        self.precision[valid] = np.linalg.inv(regularized[valid])
+
+    @classmethod
+    def from_legacy(cls, reference_keypoints):
+        """Means only, from a reference_keypoints.pkl dict (no tolerances: checks never fail)"""
+        poses = sorted(reference_keypoints)
+        xyz = np.asarray([reference_keypoints[p] for p in poses], dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+        frames = np.concatenate([xyz, np.ones(xyz.shape[:2] + (1,), dtype=np.float32)], axis=-1)
+        return cls({
+            "poses": np.array(poses),
+            "count": np.zeros(len(poses), dtype=np.int64),
+            "mean_raw": xyz,
+            "mean": normalize_landmarks(frames, scale=True)[..., :3],
+            "cov": np.full((len(poses), NUM_LANDMARKS, 3, 3), np.nan, dtype=np.float32),
+            "angle_mean": joint_angles(frames, list(BODY_ANGLES.values())).astype(np.float32),
+            "angle_var": np.full((len(poses), len(ANGLE_NAMES)), np.nan, dtype=np.float32),
+        })
+
+    def __contains__(self, pose_name):
+        return normalize_pose_name(pose_name) in self._index
+
+    def reference_frames(self):
+        """(P, 33, 4) mean landmarks per pose in image coordinates, fully visible"""
+        return np.concatenate([self.mean_raw, np.ones(self.mean_raw.shape[:2] + (1,), dtype=np.float32)],
+                              axis=-1)
+
+    def joint_deviation(self, pose_name, landmarks):
+        """(N, 33) Mahalanobis distance of each landmark from the pose's reference distribution"""
+        i = self._index[normalize_pose_name(pose_name)]
+        x = normalize_landmarks(np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4),
+                                scale=True)[..., :3]
+        d = x - self.mean[i]
+        return np.sqrt(np.einsum("njk,jkl,njl->nj", d, self.precision[i], d))
+
+    def angle_zscores(self, pose_name, landmarks):
+        """(N, len(ANGLE_NAMES)) z-scores of the joint angles against the pose's reference"""
+        i = self._index[normalize_pose_name(pose_name)]
+        angles = joint_angles(np.asarray(landmarks).reshape(-1, NUM_LANDMARKS, 4), list(BODY_ANGLES.values()))
+        # +1 deg² so angles that barely vary in the references still get some slack
+        return (angles - self.angle_mean[i]) / np.sqrt(self.angle_var[i] + 1.0)
+
+    def tolerance_check(self, pose_name, landmarks, max_distance=3.5, max_z=2.5, min_visibility=0.5):
+        """
+        Body landmarks and angles outside tolerance for (N, 33, 4) landmarks, as
+        boolean arrays (N, 33) and (N, len(ANGLE_NAMES)). Poorly visible
+        landmarks and poses without reference statistics never fail.
+        """
+        lm = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4)
+        if pose_name not in self:
+            return np.zeros(lm.shape[:2], dtype=bool), np.zeros((len(lm), len(ANGLE_NAMES)), dtype=bool)
+        joints = np.zeros(lm.shape[:2], dtype=bool)
+        joints[:, BODY_LANDMARKS] = self.joint_deviation(pose_name, lm)[:, BODY_LANDMARKS] > max_distance
+        joints &= lm[..., 3] >= min_visibility
+        angles = np.abs(self.angle_zscores(pose_name, lm)) > max_z
+        return joints, angles
+
+
+def load_reference_stats(path=REF_PATH):
+    """Load reference statistics, falling back to the means in a legacy reference_keypoints.pkl"""
+    if not os.path.exists(path) and os.path.exists(LEGACY_REF_PATH):
+        with open(LEGACY_REF_PATH, "rb") as f:
+            return ReferenceStats.from_legacy(pickle.load(f))
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data["format_version"])
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported reference stats format {version} in {path}")
+        return ReferenceStats({name: data[name] for name in data.files})
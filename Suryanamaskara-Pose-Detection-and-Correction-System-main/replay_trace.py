@@ -0,0 +1,127 @@
+"""
+Replay recorded landmark traces through the classifier, the angle rules and
+the pose sequence logic at full speed, without a camera or running MediaPipe.
+
+Modes mirror where a trace was recorded:
+    correc  - 12 pose sequence with correc.py's pixel-space correction rules
+    real_ex - 8 pose sequence with real_ex.py's plank/ashtanga rule overrides
+    api     - 12 pose sequence with the API server's correction messages
+
+Traces recorded by the API server interleave every client's frames; each
+session is replayed separately with its own sequence state.
+
+Usage:
+    python replay_trace.py session.trace --mode correc --output replay.json
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+
+import correc
+import real_ex
+from landmark_trace import read_trace, detected_mask, split_sessions
+from pose_pipeline import (
+    MODEL_PATH, SequenceTracker, load_model, model_features, classify,
+    calculate_angles, check_pose_corrections, failed_checks, normalize_pose_name
+)
+
+
+def replay(model, header, records, mode="correc"):
+    """Replay one trace; returns a deterministic summary of the session"""
+    mask = detected_mask(records)
+    landmarks = records["landmarks"][mask]
+    timestamps = records["t"][mask]
+    width, height = header["width"] or 1, header["height"] or 1
+
+    # Classifier and angle rules run vectorized over the whole trace
+    labels = []
+    if len(landmarks):
+        predicted, _ = classify(model, model_features(model, landmarks))
+        labels = [normalize_pose_name(str(label)) for label in predicted]
+        frame_size = (width, height) if mode == "correc" else None
+        angles = calculate_angles(landmarks, frame_size=frame_size)
+
+    script = real_ex if mode == "real_ex" else correc
+    sequence = SequenceTracker(script.POSE_ORDER, script.CONSISTENT_FRAMES_REQUIRED, script.HOLD_FRAMES)
+    completed = []
+    corrections = Counter()
+
+    for i, label in enumerate(labels):
+        if sequence.finished:
+            break
+        target_norm = normalize_pose_name(sequence.target_pose)
+
+        if mode == "real_ex":
+            if target_norm in ("kumbhakasana", "ashtanga_namaskara"):
+                joint_angles = real_ex.compute_angles(landmarks[i], (height, width))
+                if target_norm == "kumbhakasana" and real_ex.plank_rule_override(joint_angles):
+                    label = labels[i] = "kumbhakasana"
+                if target_norm == "ashtanga_namaskara" and real_ex.ashtanga_rule_override(joint_angles):
+                    label = labels[i] = "ashtanga_namaskara"
+        elif mode == "correc":
+            corrections.update(message for _, _, message in failed_checks(label, angles[i]))
+        else:
+            corrections.update(check_pose_corrections(label, landmarks[i], angles[i]))
+
+        if sequence.update(label):
+            completed.append({"pose": target_norm, "t": float(timestamps[i] - records["t"][0])})
+
+    return {
+        "mode": mode,
+        "frames": int(len(records)),
+        "detected": int(mask.sum()),
+        "labels": labels,
+        "label_counts": dict(Counter(labels)),
+        "completed": completed,
+        "finished": sequence.finished,
+        "corrections": dict(corrections),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay landmark traces without a camera")
+    parser.add_argument("traces", nargs="+", help="Trace files to replay")
+    parser.add_argument("--mode", choices=["correc", "real_ex", "api"], default="correc")
+    parser.add_argument("--model", default=MODEL_PATH, help="Classifier to replay against")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay each trace N times (throughput)")
+    parser.add_argument("--output", help="Write the replay summaries as JSON")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    summaries = {}
+    for path in args.traces:
+        header, records = read_trace(path)
+        sessions = split_sessions(records)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            per_session = {f"{key:016x}": replay(model, header, session_records, args.mode)
+                           for key, session_records in sessions.items()}
+        elapsed = time.perf_counter() - started
+
+        if len(per_session) == 1:
+            summary = next(iter(per_session.values()))
+        else:
+            summary = {
+                "mode": args.mode,
+                "frames": int(len(records)),
+                "detected": sum(s["detected"] for s in per_session.values()),
+                "completed": [c for s in per_session.values() for c in s["completed"]],
+                "sessions": per_session,
+            }
+        frames = len(records) * args.repeat
+        summary["elapsed_s"] = round(elapsed, 4)
+        summary["fps"] = round(frames / elapsed, 1) if elapsed else None
+        summaries[path] = summary
+        print(f"✅ {path}: {len(sessions)} session(s), {summary['detected']}/{summary['frames']} frames "
+              f"with a pose, {len(summary['completed'])} poses completed, {summary['fps']} fps")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summaries, f, indent=2)
+        print(f"\n🎯 Replay summaries saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+On-demand cProfile capture for the running API server.
+
+A capture is started for N seconds and/or N requests. While it runs, one
+request at a time is profiled with cProfile (requests arriving meanwhile
+run unprofiled, so the overhead stays bounded under load), and the time
+spent in each stage of the request (decode, pose, classify, corrections,
+serialize) is recorded alongside. When the capture ends, a zip with the
+merged profile (profile.prof, loadable by pstats/snakeviz), a text summary
+and the per-request stage timings is written in a background thread.
+
+Outside a capture, request() and stage() cost one attribute check.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+import zipfile
+from contextlib import contextmanager
+
+import numpy as np
+
+STAGES = ["decode", "pose", "classify", "corrections", "serialize"]
+
+
+class _Capture:
+    def __init__(self, seconds, max_requests):
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.deadline = self.started + seconds if seconds else None
+        self.max_requests = max_requests
+        self.state = "running"
+        self.stats = None
+        self.records = []
+        self.path = None
+        self.error = None
+
+    def expired(self):
+        return ((self.deadline is not None and time.time() >= self.deadline) or
+                (self.max_requests is not None and len(self.records) >= self.max_requests))
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds_left": max(0.0, round(self.deadline - time.time(), 1)) if self.deadline else None,
+            "max_requests": self.max_requests,
+            "requests": len(self.records),
+            "error": self.error,
+        }
+
+
+class RequestProfiler:
+    def __init__(self, output_dir, keep=10):
+        self.output_dir = output_dir
+        self.keep = keep
+        self._capture = None
+        self._captures = {}
+        self._lock = threading.Lock()
+        # Only one request is under cProfile at a time
+        self._busy = threading.Lock()
+        self._local = threading.local()
+
+    def start(self, seconds=30.0, max_requests=None):
+        """Start a capture; raises ValueError if one is already running"""
+        if not seconds and not max_requests:
+            raise ValueError("Give a duration, a request count or both")
+        with self._lock:
+            if self._capture is not None:
+                raise ValueError(f"Capture {self._capture.id} is already running")
+            capture = _Capture(seconds, max_requests)
+            self._capture = capture
+            self._captures[capture.id] = capture
+            for old in list(self._captures)[:-self.keep]:
+                self._captures.pop(old)
+            return capture.summary()
+
+    @contextmanager
+    def request(self):
+        capture = self._capture
+        if capture is None:
+            yield
+            return
+        if capture.expired():
+            self._finish(capture)
+            yield
+            return
+        if not self._busy.acquire(blocking=False):
+            yield
+            return
+
+        record = {"t": round(time.time(), 3)}
+        self._local.record = record
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            record["total"] = round((time.perf_counter() - started) * 1000.0, 3)
+            self._local.record = None
+            self._busy.release()
+            with self._lock:
+                if capture.state == "running":
+                    if capture.stats is None:
+                        capture.stats = pstats.Stats(profile)
+                    else:
+                        capture.stats.add(profile)
+                    capture.records.append(record)
+            if capture.expired():
+                self._finish(capture)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage of the current request, if it is being profiled"""
+        record = getattr(self._local, "record", None)
+        if record is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record[name] = round(record.get(name, 0.0) + (time.perf_counter() - started) * 1000.0, 3)
+
+    def _finish(self, capture):
+        with self._lock:
+            if capture.state != "running":
+                return
+            capture.state = "writing"
+            if self._capture is capture:
+                self._capture = None
+        # Keep file I/O off the request path
+        threading.Thread(target=self._write, args=(capture,), daemon=True).start()
+
+    def _write(self, capture):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"profile-{capture.id}.zip")
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr("stages.json", json.dumps({
+                    **capture.summary(),
+                    "stages": self.stage_summary(capture.records),
+                    "requests": capture.records,
+                }, indent=1))
+                if capture.stats is not None:
+                    text = io.StringIO()
+                    capture.stats.stream = text
+                    capture.stats.sort_stats("cumulative").print_stats(80)
+                    zf.writestr("profile.txt", text.getvalue())
+                    prof_path = f"{path}.prof"
+                    capture.stats.dump_stats(prof_path)
+                    zf.write(prof_path, "profile.prof")
+                    os.remove(prof_path)
+            capture.path = path
+            capture.state = "done"
+        except Exception as e:
+            capture.error = str(e)
+            capture.state = "failed"
+
+    @staticmethod
+    def stage_summary(records):
+        summary = {}
+        for name in STAGES + ["total"]:
+            values = np.array([r[name] for r in records if name in r])
+            if len(values):
+                summary[name] = {
+                    "n": int(len(values)),
+                    "mean_ms": round(float(values.mean()), 3),
+                    "p50_ms": round(float(np.percentile(values, 50)), 3),
+                    "p95_ms": round(float(np.percentile(values, 95)), 3),
+                }
+        return summary
+
+    def status(self, capture_id=None):
+        """Summary of one capture, or of the running one (finishing it if it has expired)"""
+        capture = self._captures.get(capture_id) if capture_id else self._capture
+        if capture is None:
+            return None
+        if capture.state == "running" and capture.expired():
+            self._finish(capture)
+        return capture.summary()
+
+    def path(self, capture_id):
+        capture = self._captures.get(capture_id)
+        return capture.path if capture and capture.state == "done" else None
+
+    def captures(self):
+        return [capture.summary() for capture in self._captures.values()]
@@ -0,0 +1,193 @@
+"""
+Session history, persisted off the request path.
+
+Predict handlers call record(), which only appends the frame's pose,
+confidence and corrections to an in-memory queue. A background writer
+drains the queue, folds consecutive frames of the same pose into hold
+segments per session (closed when the pose changes or the session goes
+quiet for `gap_s`), and writes closed segments in batches to SQLite in WAL
+mode. Queries open their own read connections, which WAL lets run
+alongside the writer.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from contextlib import closing
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    pose TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    mean_confidence REAL NOT NULL,
+    corrected_frames INTEGER NOT NULL,
+    top_correction TEXT
+);
+CREATE INDEX IF NOT EXISTS segments_session ON segments (session_id, started_at);
+"""
+
+
+class _Segment:
+    __slots__ = ("session_id", "pose", "started_at", "ended_at", "frames",
+                 "confidence_sum", "corrected_frames", "corrections")
+
+    def __init__(self, session_id, pose, t):
+        self.session_id = session_id
+        self.pose = pose
+        self.started_at = self.ended_at = t
+        self.frames = 0
+        self.confidence_sum = 0.0
+        self.corrected_frames = 0
+        self.corrections = Counter()
+
+    def add(self, t, confidence, corrections):
+        self.ended_at = t
+        self.frames += 1
+        self.confidence_sum += confidence
+        if corrections:
+            self.corrected_frames += 1
+            # "Keep arms straight (angle: 150°)" → "Keep arms straight"
+            self.corrections.update(c.split(" (angle:")[0] for c in corrections)
+
+    def row(self):
+        top = self.corrections.most_common(1)
+        return (self.session_id, self.pose, self.started_at, self.ended_at, self.frames,
+                self.confidence_sum / self.frames, self.corrected_frames, top[0][0] if top else None)
+
+
+class SessionHistory:
+    def __init__(self, db_path, flush_interval_s=1.0, gap_s=2.0, max_queue=50000):
+        self.db_path = db_path
+        self.flush_interval_s = flush_interval_s
+        self.gap_s = gap_s
+        # deque appends are atomic, so record() takes no lock
+        self._events = deque(maxlen=max_queue)
+        self._open = {}
+        # Closed segments whose write failed, retried on the next flush
+        self._unwritten = []
+        self._stop = threading.Event()
+        self._recorded = 0
+        self._segments_written = 0
+        self._segments_dropped = 0
+        self._last_flush_ms = None
+        self._last_error = None
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        self._thread = threading.Thread(target=self._run, name="session-history", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(self, session_id, prediction, t=None):
+        """Queue one classified frame (a build_prediction() body); never blocks or does I/O"""
+        corrections = prediction["corrections"] if prediction.get("has_angle_corrections") else ()
+        self._events.append((session_id, prediction["pose"], prediction["confidence"],
+                             tuple(corrections), t or time.time()))
+        self._recorded += 1
+
+    # ---------------- Writer ----------------
+
+    def _drain(self):
+        """Fold queued events into open segments; returns the segments that closed"""
+        closed = []
+        while self._events:
+            session_id, pose, confidence, corrections, t = self._events.popleft()
+            segment = self._open.get(session_id)
+            if segment is not None and (segment.pose != pose or t - segment.ended_at > self.gap_s):
+                closed.append(self._open.pop(session_id))
+                segment = None
+            if segment is None:
+                segment = self._open[session_id] = _Segment(session_id, pose, t)
+            segment.add(t, confidence, corrections)
+        return closed
+
+    def _expire(self, now, everything=False):
+        quiet = [sid for sid, seg in self._open.items() if everything or now - seg.ended_at > self.gap_s]
+        return [self._open.pop(sid) for sid in quiet]
+
+    def _write(self, conn, segments):
+        if not segments:
+            return
+        started = time.perf_counter()
+        with conn:
+            conn.executemany(
+                "INSERT INTO segments (session_id, pose, started_at, ended_at, frames, "
+                "mean_confidence, corrected_frames, top_correction) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [segment.row() for segment in segments])
+        self._segments_written += len(segments)
+        self._last_flush_ms = round((time.perf_counter() - started) * 1000.0, 2)
+
+    def _flush(self, conn, everything=False):
+        segments = self._unwritten + self._drain() + self._expire(time.time(), everything)
+        try:
+            self._write(conn, segments)
+            self._unwritten = []
+        except Exception as e:
+            self._last_error = str(e)
+            # Keep the newest segments for the next flush, bounded like the event queue
+            keep = [] if everything else segments[-self._events.maxlen:]
+            lost = len(segments) - len(keep)
+            if lost:
+                self._segments_dropped += lost
+                print(f"⚠️ Session history: {lost} segments lost after a failed write: {e}")
+            self._unwritten = keep
+
+    def _run(self):
+        # sqlite3 connections belong to the thread that created them
+        conn = self._connect()
+        try:
+            while not self._stop.wait(self.flush_interval_s):
+                self._flush(conn)
+            self._flush(conn, everything=True)
+        finally:
+            conn.close()
+
+    def close(self):
+        """Flush everything, including still-open segments, and stop the writer"""
+        self._stop.set()
+        self._thread.join()
+
+    # ---------------- Queries ----------------
+
+    def history(self, session_id, limit=100):
+        """Most recent hold segments of a session, newest first"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT pose, started_at, ended_at, ended_at - started_at AS seconds, frames, "
+                "mean_confidence, corrected_frames, top_correction FROM segments "
+                "WHERE session_id = ? ORDER BY started_at DESC LIMIT ?", (session_id, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def progress(self, session_id):
+        """Per-pose totals for a session: hold time, holds, confidence, correction rate"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT pose, COUNT(*) AS holds, SUM(ended_at - started_at) AS seconds, "
+                "SUM(frames) AS frames, SUM(mean_confidence * frames) / SUM(frames) AS mean_confidence, "
+                "CAST(SUM(corrected_frames) AS REAL) / SUM(frames) AS correction_rate, "
+                "MIN(started_at) AS first_seen, MAX(ended_at) AS last_seen "
+                "FROM segments WHERE session_id = ? GROUP BY pose ORDER BY first_seen",
+                (session_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def metrics(self):
+        return {
+            "queued": len(self._events),
+            "open_segments": len(self._open),
+            "recorded": self._recorded,
+            "segments_written": self._segments_written,
+            "segments_unwritten": len(self._unwritten),
+            "segments_dropped": self._segments_dropped,
+            "last_flush_ms": self._last_flush_ms,
+            "last_error": self._last_error,
+        }
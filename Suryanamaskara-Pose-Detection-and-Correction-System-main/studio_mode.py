@@ -0,0 +1,317 @@
+"""
+Multi-camera studio mode for group classes.
+
+One capture process per camera (station) resizes and converts every frame
+straight into a multiprocessing.shared_memory ring buffer. A pool of
+inference processes, each with its own classifier and one Pose tracker per
+station it owns, reads the newest frame of its stations directly from
+shared memory. Frames are never pickled between processes; only the small
+per-frame results travel over a queue to the main process, which shows
+every station in one window.
+
+Stations are spread over the inference processes round-robin, so capacity
+grows with the number of cores. Each station keeps its own sequence
+progress (see SequenceTracker), and inference always takes the newest
+frame, so a slow worker drops frames rather than falling behind.
+
+MediaPipe reads a slot in place while the camera keeps writing the ring.
+If processing outlasts the ring (the slot was overwritten before the
+result was checked), the station counts an overrun and switches to copying
+each frame out of its slot before processing. Skipped and overrun frames
+are reported per station next to the frame rate.
+
+Usage:
+    python studio_mode.py --camera 0 --camera 1 --camera 2
+    python studio_mode.py --camera 0 --camera rtsp://10.0.0.5/stream --workers 2 --headless
+"""
+
+import argparse
+import multiprocessing as mp_proc
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from correc import POSE_ORDER, CONSISTENT_FRAMES_REQUIRED, HOLD_FRAMES
+from pose_pipeline import (
+    MODEL_PATH,
+    load_model, create_pose, landmarks_to_array, model_features, classify, boost_confidence,
+    check_pose_corrections, normalize_pose_name, SequenceTracker
+)
+
+DEFAULT_SLOTS = 4
+IDLE_SLEEP_S = 0.002
+
+
+class FrameRing:
+    """
+    Fixed-size ring of RGB frames in shared memory.
+
+    Layout: int64 [latest_seq, slot_seq * slots], float64 [timestamp * slots],
+    then `slots` frames of (height, width, 3) uint8. A slot's sequence number
+    is -1 while it is being written, so readers can tell a frame that was
+    overwritten under them (seqlock style) and drop it.
+    """
+
+    def __init__(self, name, width, height, slots=DEFAULT_SLOTS, create=False):
+        self.width, self.height, self.slots = width, height, slots
+        header = 8 * (1 + slots) + 8 * slots
+        size = header + slots * height * width * 3
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            try:
+                # Only the creating process owns (and unlinks) the segment
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:  # Python < 3.13
+                self.shm = shared_memory.SharedMemory(name=name)
+        buf = self.shm.buf
+        self._seq = np.ndarray((1 + slots,), dtype=np.int64, buffer=buf)
+        self._ts = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=8 * (1 + slots))
+        self.frames = np.ndarray((slots, height, width, 3), dtype=np.uint8, buffer=buf, offset=header)
+        if create:
+            self._seq[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def latest(self):
+        return int(self._seq[0])
+
+    def write(self, frame_bgr, seq, timestamp):
+        """Resize and convert a BGR camera frame directly into the next slot"""
+        slot = seq % self.slots
+        self._seq[1 + slot] = -1
+        target = self.frames[slot]
+        if frame_bgr.shape[1] != self.width or frame_bgr.shape[0] != self.height:
+            frame_bgr = cv2.resize(frame_bgr, (self.width, self.height))
+        cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=target)
+        self._ts[slot] = timestamp
+        self._seq[1 + slot] = seq
+        self._seq[0] = seq
+
+    def view(self, seq):
+        """(frame view, timestamp) of `seq` if its slot still holds it, else None"""
+        slot = seq % self.slots
+        if seq < 0 or self._seq[1 + slot] != seq:
+            return None
+        return self.frames[slot], float(self._ts[slot])
+
+    def holds(self, seq):
+        return seq >= 0 and self._seq[1 + seq % self.slots] == seq
+
+    def close(self):
+        # Drop the numpy views first, or the buffer can't be released
+        self._seq = self._ts = self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _capture(station, source, ring_name, width, height, slots, stop):
+    ring = FrameRing(ring_name, width, height, slots)
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    seq = 0
+    try:
+        while not stop.is_set():
+            ok, frame = cap.read()
+            if not ok:
+                time.sleep(0.01)
+                continue
+            ring.write(cv2.flip(frame, 1), seq, time.time())
+            seq += 1
+    finally:
+        cap.release()
+        ring.close()
+
+
+class _Station:
+    """Per-station state inside an inference process"""
+
+    def __init__(self, index, ring):
+        self.index = index
+        self.ring = ring
+        self.pose = create_pose(model_complexity=1)
+        self.sequence = SequenceTracker(POSE_ORDER, CONSISTENT_FRAMES_REQUIRED, HOLD_FRAMES)
+        self.last_seq = -1
+        # Private frame copy, allocated once processing has outlasted the ring
+        self.buffer = None
+        self.skipped = 0
+        self.overruns = 0
+        self.unsent = 0
+
+
+def _infer(worker, stations, ring_names, width, height, slots, model_path, results, stop):
+    model = load_model(model_path)
+    owned = [_Station(i, FrameRing(ring_names[i], width, height, slots)) for i in stations]
+    try:
+        while not stop.is_set():
+            busy = False
+            for station in owned:
+                seq = station.ring.latest()
+                if seq <= station.last_seq:
+                    continue
+                frame = station.ring.view(seq)
+                if frame is None or station.sequence.finished:
+                    continue
+                busy = True
+                if station.last_seq >= 0:
+                    station.skipped += seq - station.last_seq - 1
+                station.last_seq = seq
+                rgb, captured_at = frame
+
+                if station.buffer is not None:
+                    np.copyto(station.buffer, rgb)
+                    rgb = station.buffer
+                    if not station.ring.holds(seq):
+                        station.overruns += 1
+                        continue  # overwritten while copying
+                # Otherwise MediaPipe reads the shared-memory slot in place
+                pose_results = station.pose.process(rgb)
+                if rgb is not station.buffer and not station.ring.holds(seq):
+                    # Overwritten by the camera while we read it: the ring is too short
+                    # for this station's processing time, copy frames out from now on
+                    station.overruns += 1
+                    station.buffer = np.empty_like(rgb)
+                    print(f"⚠️ Station {station.index + 1}: frame overwritten during processing "
+                          f"({station.ring.slots} slots), copying frames from now on")
+                    continue
+
+                result = {"station": station.index, "worker": worker, "seq": seq,
+                          "latency_ms": round((time.time() - captured_at) * 1000.0, 1),
+                          "target": station.sequence.target_pose, "pose": None,
+                          "skipped": station.skipped, "overruns": station.overruns,
+                          "unsent": station.unsent}
+                if pose_results.pose_landmarks:
+                    landmarks = landmarks_to_array(pose_results.pose_landmarks)
+                    labels, raw_confidences = classify(model, model_features(model, landmarks))
+                    predicted = normalize_pose_name(str(labels[0]))
+                    result.update(
+                        pose=predicted,
+                        confidence=round(boost_confidence(raw_confidences[0]), 3),
+                        corrections=check_pose_corrections(predicted, landmarks),
+                        completed=station.sequence.update(predicted),
+                        finished=station.sequence.finished,
+                    )
+                try:
+                    results.put_nowait(result)
+                except queue.Full:
+                    station.unsent += 1
+            if not busy:
+                time.sleep(IDLE_SLEEP_S)
+    finally:
+        for station in owned:
+            station.pose.close()
+            station.ring.close()
+
+
+def _render(rings, latest, width, height):
+    """One window with every station's newest frame and its latest result"""
+    tiles = []
+    for i, ring in enumerate(rings):
+        frame = ring.view(ring.latest())
+        tile = (cv2.cvtColor(frame[0], cv2.COLOR_RGB2BGR) if frame is not None
+                else np.zeros((height, width, 3), dtype=np.uint8))
+        result = latest.get(i, {})
+        cv2.putText(tile, f"Station {i + 1} - target: {result.get('target', '-')}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(tile, f"Predicted: {result.get('pose') or '-'} ({result.get('latency_ms', '-')}ms)", (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.putText(tile, f"Skipped: {result.get('skipped', 0)}  overruns: {result.get('overruns', 0)}",
+                    (10, height - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+        for j, msg in enumerate(result.get("corrections") or []):
+            cv2.putText(tile, msg, (10, 95 + j * 28), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        if result.get("finished"):
+            cv2.putText(tile, "Sequence complete", (10, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        tiles.append(tile)
+
+    columns = int(np.ceil(np.sqrt(len(tiles))))
+    tiles += [np.zeros_like(tiles[0])] * (columns * int(np.ceil(len(tiles) / columns)) - len(tiles))
+    rows = [np.hstack(tiles[r:r + columns]) for r in range(0, len(tiles), columns)]
+    return np.vstack(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-camera Surya Namaskar studio mode")
+    parser.add_argument("--camera", action="append", required=True,
+                        help="Camera index or stream URL, once per station")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Inference processes (default: one per station, up to the CPU count)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="Ring buffer frames per camera")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--headless", action="store_true", help="Print results instead of showing a window")
+    args = parser.parse_args()
+
+    stations = len(args.camera)
+    workers = max(1, min(args.workers or stations, stations, os.cpu_count() or 1))
+
+    # spawn keeps MediaPipe's internal threads out of the forked children
+    ctx = mp_proc.get_context("spawn")
+    stop = ctx.Event()
+    results = ctx.Queue(maxsize=1024)
+    tag = f"surya_{os.getpid()}"
+    rings = [FrameRing(f"{tag}_{i}", args.width, args.height, args.slots, create=True)
+             for i in range(stations)]
+    ring_names = [ring.name for ring in rings]
+
+    processes = [ctx.Process(target=_capture, name=f"capture-{i}", daemon=True,
+                             args=(i, source, ring_names[i], args.width, args.height, args.slots, stop))
+                 for i, source in enumerate(args.camera)]
+    processes += [ctx.Process(target=_infer, name=f"infer-{w}", daemon=True,
+                              args=(w, list(range(w, stations, workers)), ring_names,
+                                    args.width, args.height, args.slots, args.model, results, stop))
+                  for w in range(workers)]
+    for process in processes:
+        process.start()
+    print(f"🎥 {stations} stations, {workers} inference processes")
+
+    latest = {}
+    processed = [0] * stations
+    last_report = time.time()
+    try:
+        while True:
+            try:
+                while True:
+                    result = results.get_nowait()
+                    latest[result["station"]] = result
+                    processed[result["station"]] += 1
+            except queue.Empty:
+                pass
+
+            if args.headless:
+                if time.time() - last_report >= 1.0:
+                    for i in range(stations):
+                        r = latest.get(i, {})
+                        print(f"Station {i + 1}: {processed[i]:3d} fps  target={r.get('target')}  "
+                              f"pose={r.get('pose')}  latency={r.get('latency_ms')}ms  "
+                              f"skipped={r.get('skipped', 0)}  overruns={r.get('overruns', 0)}  "
+                              f"unsent={r.get('unsent', 0)}")
+                    processed = [0] * stations
+                    last_report = time.time()
+                time.sleep(0.02)
+                continue
+
+            cv2.imshow("Surya Namaskar Studio", _render(rings, latest, args.width, args.height))
+            if cv2.waitKey(30) & 0xFF == ord('q'):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for process in processes:
+            process.join(timeout=5)
+        for ring in rings:
+            ring.close()
+            ring.unlink()
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,131 @@
+import argparse
 import pandas as pd
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split, GridSearchCV, StratifiedGroupKFold
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
 import joblib
+import numpy as np
 import os
 
-# --------------------
-# 1️⃣ Load CSV
-# --------------------
+from pose_features import FEATURE_COLUMNS, ENGINEERED_FEATURE_COLUMNS, FEATURE_SETS, engineered_features
+from augment_landmarks import augment_batch
+import model_registry
+
 HERE = os.path.dirname(os.path.abspath(__file__))
-csv_path = os.path.join(HERE, "pose_landmarks.csv")
-if not os.path.exists(csv_path):
-    raise FileNotFoundError(f"CSV file not found: {csv_path}")
-
-df = pd.read_csv(csv_path)
-print(f"Loaded {len(df)} samples from {csv_path}")
-
-if len(df) == 0:
-    raise ValueError("CSV file is empty! Ensure landmark extraction worked correctly.")
-
-# --------------------
-# 2️⃣ Separate features & labels
-# --------------------
-X = df.drop("label", axis=1)
-y = df["label"]
-
-# --------------------
-# 3️⃣ Train-test split
-# --------------------
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-print(f"Train size: {len(X_train)}, Test size: {len(X_test)}")
-
-# --------------------
-# 4️⃣ RandomForest with Hyperparameter Tuning
-# --------------------
-param_grid = {
-    'n_estimators': [100, 200, 300],
-    'max_depth': [None, 10, 20, 30],
-    'min_samples_split': [2, 5, 10],
-    'min_samples_leaf': [1, 2, 4]
+
+# Hyperparameter grids per feature set. Engineered features are translation
+# and scale invariant, so far fewer and shallower trees are needed.
+PARAM_GRIDS = {
+    'raw': {
+        'n_estimators': [100, 200, 300],
+        'max_depth': [None, 10, 20, 30],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4]
+    },
+    'engineered': {
+        'n_estimators': [25, 50, 100],
+        'max_depth': [8, 12, 16],
+        'min_samples_split': [2, 5],
+        'min_samples_leaf': [1, 2]
+    },
 }
 
-rf = RandomForestClassifier(random_state=42, class_weight='balanced')
-grid_search = GridSearchCV(rf, param_grid, cv=3, n_jobs=-1, verbose=2)
-grid_search.fit(X_train, y_train)
-
-best_model = grid_search.best_estimator_
-print(f"Best Parameters: {grid_search.best_params_}")
-
-# --------------------
-# 5️⃣ Evaluation
-# --------------------
-y_pred = best_model.predict(X_test)
-print("\nClassification Report:\n", classification_report(y_test, y_pred))
-print(f"✅ Accuracy: {accuracy_score(y_test, y_pred):.4f}")
-
-print("\nConfusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
-
-# --------------------
-# 6️⃣ Save model
-# --------------------
-models_dir = os.path.join(HERE, "models")
-os.makedirs(models_dir, exist_ok=True)
-model_path = os.path.join(models_dir, "pose_classifier_rf.pkl")
-joblib.dump(best_model, model_path)
-# Also save a copy in the root directory for easier access by other scripts
-root_model_path = os.path.join(HERE, "pose_classifier_rf.pkl")
-joblib.dump(best_model, root_model_path)
-print(f"💾 Model saved as {model_path} and {root_model_path}")
+
+def build_features(raw, feature_set):
+    """Model input for the given feature set, from an (N, 132) raw landmark matrix"""
+    if feature_set == "engineered":
+        return pd.DataFrame(engineered_features(raw), columns=ENGINEERED_FEATURE_COLUMNS)
+    return pd.DataFrame(np.asarray(raw).reshape(len(raw), -1), columns=FEATURE_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the pose classifier")
+    parser.add_argument("--features", choices=FEATURE_SETS, default="raw",
+                        help="Feature set the model is trained on")
+    parser.add_argument("--augment", type=int, default=0, metavar="COPIES",
+                        help="Add COPIES landmark-space augmented variants of every training sample")
+    args = parser.parse_args()
+
+    # --------------------
+    # 1️⃣ Load CSV
+    # --------------------
+    csv_path = os.path.join(HERE, "pose_landmarks.csv")
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+
+    df = pd.read_csv(csv_path)
+    print(f"Loaded {len(df)} samples from {csv_path}")
+
+    if len(df) == 0:
+        raise ValueError("CSV file is empty! Ensure landmark extraction worked correctly.")
+
+    # --------------------
+    # 2️⃣ Separate landmarks & labels
+    # --------------------
+    raw = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    y = df["label"].to_numpy()
+
+    # --------------------
+    # 3️⃣ Train-test split
+    # --------------------
+    raw_train, raw_test, y_train, y_test = train_test_split(
+        raw, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    # Augmentation only ever touches the training split. Every variant is
+    # grouped with its source sample so cross-validation keeps them in one fold.
+    groups = np.arange(len(raw_train))
+    if args.augment:
+        aug, aug_labels = augment_batch(raw_train, y_train, copies=args.augment)
+        raw_train = np.concatenate([raw_train, aug.reshape(len(aug), -1)])
+        y_train = np.concatenate([y_train, aug_labels])
+        groups = np.concatenate([groups, np.tile(groups, args.augment)])
+        print(f"Augmented training set with {len(aug)} samples")
+
+    X_train = build_features(raw_train, args.features)
+    X_test = build_features(raw_test, args.features)
+    print(f"Feature set: {args.features} ({X_train.shape[1]} features)")
+    print(f"Train size: {len(X_train)}, Test size: {len(X_test)}")
+
+    # --------------------
+    # 4️⃣ RandomForest with Hyperparameter Tuning
+    # --------------------
+    rf = RandomForestClassifier(random_state=42, class_weight='balanced')
+    grid_search = GridSearchCV(rf, PARAM_GRIDS[args.features], cv=StratifiedGroupKFold(n_splits=3),
+                               n_jobs=-1, verbose=2)
+    grid_search.fit(X_train, y_train, groups=groups)
+
+    best_model = grid_search.best_estimator_
+    best_model.feature_set_ = args.features
+    print(f"Best Parameters: {grid_search.best_params_}")
+
+    # --------------------
+    # 5️⃣ Evaluation
+    # --------------------
+    y_pred = best_model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print("\nClassification Report:\n", classification_report(y_test, y_pred))
+    print(f"✅ Accuracy: {accuracy:.4f}")
+
+    print("\nConfusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+
+    total_nodes = sum(tree.tree_.node_count for tree in best_model.estimators_)
+    print(f"🌲 {len(best_model.estimators_)} trees, {total_nodes} nodes in total")
+
+    # --------------------
+    # 6️⃣ Save model
+    # --------------------
+    models_dir = os.path.join(HERE, "models")
+    os.makedirs(models_dir, exist_ok=True)
+    model_path = os.path.join(models_dir, "pose_classifier_rf.pkl")
+    joblib.dump(best_model, model_path)
+    # Register a version; this also copies it to the root directory for the other scripts
+    entry = model_registry.save_version(best_model, source="grid-search", accuracy=round(accuracy, 4),
+                                        params=grid_search.best_params_, holdout=(raw_test, y_test))
+    print(f"💾 Model saved as {model_path} and {model_registry.version_path(entry)} "
+          f"(version {entry['version']}, now current)")
+
+
+if __name__ == "__main__":
+    main()
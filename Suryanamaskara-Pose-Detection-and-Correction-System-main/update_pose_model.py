@@ -0,0 +1,155 @@
+"""
+Incremental update of the pose classifier from newly labelled samples,
+without rerunning the train_pose_model.py grid search.
+
+The current model keeps its tuned hyperparameters. It is updated on the new
+samples plus a stratified replay sample of the original training split (so
+the trees do not forget the old data), in one of two modes:
+
+    grow   - add --trees extra trees (warm start); the forest gets larger
+    refit  - replace the --trees oldest trees with new ones; size is unchanged
+
+The result is scored on the held-out rows recorded with the model's
+version (see model_registry.py), which are never replayed or trained on,
+and is registered as a new version only if its accuracy does not regress.
+
+Usage:
+    python update_pose_model.py new_samples.csv
+    python update_pose_model.py new_samples.csv --mode refit --trees 40
+"""
+
+import argparse
+import copy
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+import model_registry
+from pose_features import model_features
+from pose_pipeline import HERE, FEATURE_COLUMNS, NUM_LANDMARKS
+
+CSV_PATH = os.path.join(HERE, "pose_landmarks.csv")
+
+
+def load_samples(csv_path):
+    df = pd.read_csv(csv_path)
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float32), df["label"].to_numpy()
+
+
+def row_keys(X, y):
+    """Content key per (landmarks, label) row, for matching rows across CSV versions"""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    return np.array([hashlib.sha1(row.tobytes() + str(label).encode()).hexdigest()
+                     for row, label in zip(X, y)])
+
+
+def replay_sample(X, y, fraction, seed=42):
+    """Stratified `fraction` of (X, y) with at least one sample of every class"""
+    rng = np.random.default_rng(seed)
+    keep = []
+    for label in np.unique(y):
+        idx = np.flatnonzero(y == label)
+        keep.append(rng.choice(idx, max(1, int(round(len(idx) * fraction))), replace=False))
+    keep = np.concatenate(keep)
+    return X[keep], y[keep]
+
+
+def grow(model, X, y, trees):
+    """Copy of `model` with `trees` extra trees fitted on X, y"""
+    updated = copy.deepcopy(model)
+    updated.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees)
+    updated.fit(X, y)
+    updated.set_params(warm_start=False)
+    return updated
+
+
+def refit(model, X, y, trees, seed):
+    """Copy of `model` with its `trees` oldest trees replaced by trees fitted on X, y"""
+    fresh = clone(model).set_params(n_estimators=trees, warm_start=False, random_state=seed)
+    fresh.fit(X, y)
+    updated = copy.deepcopy(model)
+    updated.estimators_ = model.estimators_[trees:] + fresh.estimators_
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update the pose classifier")
+    parser.add_argument("new_csv", help="CSV of newly labelled samples (same columns as pose_landmarks.csv)")
+    parser.add_argument("--csv", default=CSV_PATH, help="Original dataset, for replay and the held-out split")
+    parser.add_argument("--mode", choices=["grow", "refit"], default="grow")
+    parser.add_argument("--trees", type=int, default=25, help="Trees to add (grow) or replace (refit)")
+    parser.add_argument("--replay", type=float, default=0.2,
+                        help="Fraction of the original training split mixed into the update")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Accepted held-out accuracy drop")
+    args = parser.parse_args()
+
+    model, entry = model_registry.load_version()
+    print(f"Loaded model {'v' + str(entry['version']) if entry else 'pose_classifier_rf.pkl'} "
+          f"({len(model.estimators_)} trees)")
+
+    X_new, y_new = load_samples(args.new_csv)
+    unknown = sorted(set(y_new) - set(model.classes_))
+    if unknown:
+        print(f"❌ New labels {unknown} are not known to the model, run train_pose_model.py instead")
+        sys.exit(1)
+
+    X, y = load_samples(args.csv)
+    holdout = model_registry.load_holdout(entry)
+    if holdout is None:
+        # Older versions: re-split like train_pose_model.py (only reliable while the CSV is unchanged)
+        print("⚠️ No held-out split recorded for this version, re-splitting the dataset")
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
+    else:
+        # The recorded held-out rows are scored on and never trained on, whatever the CSV holds now
+        X_test, y_test = holdout
+        held_out = row_keys(X_test, y_test)
+        train_mask = ~np.isin(row_keys(X, y), held_out)
+        X_train, y_train = X[train_mask], y[train_mask]
+        new_mask = ~np.isin(row_keys(X_new, y_new), held_out)
+        if not new_mask.all():
+            print(f"⚠️ Skipping {int((~new_mask).sum())} new samples that are in the held-out split")
+            X_new, y_new = X_new[new_mask], y_new[new_mask]
+    X_replay, y_replay = replay_sample(X_train, y_train, args.replay)
+    X_update = np.concatenate([X_new, X_replay])
+    y_update = np.concatenate([y_new, y_replay])
+    print(f"Updating on {len(X_new)} new + {len(X_replay)} replayed samples ({args.mode}, {args.trees} trees)")
+
+    F_update = model_features(model, X_update.reshape(-1, NUM_LANDMARKS, 4))
+    F_test = model_features(model, X_test.reshape(-1, NUM_LANDMARKS, 4))
+
+    started = time.perf_counter()
+    if args.mode == "grow":
+        candidate = grow(model, F_update, y_update, args.trees)
+    else:
+        candidate = refit(model, F_update, y_update, min(args.trees, len(model.estimators_)),
+                          seed=int(time.time()))
+    elapsed = time.perf_counter() - started
+
+    baseline_acc = accuracy_score(y_test, model.predict(F_test))
+    candidate_acc = accuracy_score(y_test, candidate.predict(F_test))
+    print(f"📊 Held-out accuracy: {baseline_acc:.4f} → {candidate_acc:.4f} (updated in {elapsed:.1f}s)")
+
+    if candidate_acc < baseline_acc - args.tolerance:
+        print("❌ Accuracy regressed, model not saved")
+        sys.exit(1)
+
+    saved = model_registry.save_version(
+        candidate, source=f"update-{args.mode}", accuracy=round(candidate_acc, 4),
+        new_samples=int(len(X_new)), replay_samples=int(len(X_replay)),
+        holdout=entry["holdout"] if holdout is not None else (X_test, y_test),
+    )
+    print(f"💾 Saved {saved['file']} ({saved['n_estimators']} trees) as the current model")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Offline analysis of recorded Suryanamaskara sessions.
+
+The video is split into time chunks that are processed in parallel worker
+processes. Every worker owns its own MediaPipe Pose tracker and classifier;
+before a chunk is analysed the tracker is warmed up on a few overlap frames
+preceding it, so tracking quality at chunk boundaries matches a sequential
+pass. Only every `stride`-th frame is decoded and analysed.
+
+Usage:
+    python video_analysis.py session.mp4 -o timeline.json --workers 8 --stride 2
+"""
+
+import argparse
+import json
+import multiprocessing as mp_proc
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from pose_pipeline import (
+    ANGLE_NAMES, MODEL_PATH,
+    load_model, create_pose, landmarks_to_array, model_features,
+    classify, boost_confidence, calculate_angles, check_pose_corrections
+)
+
+DEFAULT_CHUNK_SECONDS = 10.0
+DEFAULT_WARMUP_FRAMES = 15
+
+# Per-process state, populated by _init_worker
+_model = None
+_pose = None
+
+
+def probe_video(path):
+    """Return (frame_count, fps, width, height) of a video file"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    return frame_count, fps, width, height
+
+
+def plan_chunks(frame_count, fps, chunk_seconds=DEFAULT_CHUNK_SECONDS, stride=1):
+    """Split [0, frame_count) into chunks of roughly chunk_seconds, aligned to stride"""
+    if stride < 1:
+        raise ValueError(f"stride must be at least 1, got {stride}")
+    if chunk_seconds <= 0:
+        raise ValueError(f"chunk_seconds must be positive, got {chunk_seconds}")
+    if frame_count <= 0:
+        raise ValueError("Unknown frame count (the container doesn't report it); re-encode the video, "
+                         "e.g. ffmpeg -i in.webm out.mp4")
+    chunk_frames = max(stride, int(round(chunk_seconds * fps / stride)) * stride)
+    return [(start, min(start + chunk_frames, frame_count))
+            for start in range(0, frame_count, chunk_frames)]
+
+
+def _init_worker(model_path, model_complexity):
+    global _model, _pose
+    _model = load_model(model_path)
+    _pose = create_pose(model_complexity=model_complexity)
+
+
+def _analyze_chunk(path, start, end, stride, warmup_frames):
+    """
+    Analyse frames [start, end) of the video whose index is a multiple of stride.
+    Returns columnar results for the frames where a pose was detected.
+    """
+    cap = cv2.VideoCapture(path)
+    first = max(0, start - warmup_frames * stride)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    frame_indices = []
+    landmarks_list = []
+    analysed = 0
+
+    for idx in range(first, end):
+        # grab() skips decoding frames that are dropped by decimation
+        if not cap.grab():
+            break
+        if idx % stride:
+            continue
+        ok, frame = cap.retrieve()
+        if not ok:
+            break
+
+        results = _pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if idx < start:
+            continue  # warm-up frame, only used to prime the tracker
+        analysed += 1
+        if results.pose_landmarks:
+            frame_indices.append(idx)
+            landmarks_list.append(landmarks_to_array(results.pose_landmarks))
+
+    cap.release()
+
+    if not landmarks_list:
+        return {"analysed": analysed, "frame": [], "landmarks": None,
+                "labels": [], "raw_confidences": [], "angles": None}
+
+    landmarks = np.stack(landmarks_list)
+    labels, raw_confidences = classify(_model, model_features(_model, landmarks))
+    return {
+        "analysed": analysed,
+        "frame": frame_indices,
+        "landmarks": landmarks,
+        "labels": [str(label).lower() for label in labels],
+        "raw_confidences": raw_confidences,
+        "angles": calculate_angles(landmarks),
+    }
+
+
+def analyze_video(path, workers=None, stride=1, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                  warmup_frames=DEFAULT_WARMUP_FRAMES, model_complexity=1,
+                  model_path=MODEL_PATH, progress=None):
+    """
+    Analyse a recorded video and return a compact, columnar per-frame timeline.
+    `progress`, if given, is called as progress(done_chunks, total_chunks).
+    """
+    frame_count, fps, width, height = probe_video(path)
+    chunks = plan_chunks(frame_count, fps, chunk_seconds, stride)
+    workers = workers or os.cpu_count() or 1
+
+    timeline = {
+        "video": os.path.basename(path),
+        "fps": fps,
+        "frame_count": frame_count,
+        "width": width,
+        "height": height,
+        "stride": stride,
+        "angle_names": ANGLE_NAMES,
+        "pose_labels": [],
+        "frames": {"frame": [], "time": [], "pose": [], "confidence": [],
+                   "angles": [], "corrections": []},
+    }
+    frames = timeline["frames"]
+    label_index = {}
+    analysed = 0
+
+    started = time.perf_counter()
+    # spawn keeps MediaPipe's internal threads out of the forked children
+    ctx = mp_proc.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, max(1, len(chunks))), mp_context=ctx,
+                             initializer=_init_worker,
+                             initargs=(model_path, model_complexity)) as executor:
+        futures = [executor.submit(_analyze_chunk, path, start, end, stride, warmup_frames)
+                   for start, end in chunks]
+        for done, future in enumerate(futures, 1):
+            chunk = future.result()
+            analysed += chunk["analysed"]
+            for i, idx in enumerate(chunk["frame"]):
+                label = chunk["labels"][i]
+                if label not in label_index:
+                    label_index[label] = len(timeline["pose_labels"])
+                    timeline["pose_labels"].append(label)
+                angles = chunk["angles"][i]
+                frames["frame"].append(idx)
+                frames["time"].append(round(idx / fps, 3))
+                frames["pose"].append(label_index[label])
+                frames["confidence"].append(round(boost_confidence(chunk["raw_confidences"][i]), 4))
+                frames["angles"].append([round(float(a), 1) for a in angles])
+                frames["corrections"].append(
+                    check_pose_corrections(label, chunk["landmarks"][i], angles))
+            if progress:
+                progress(done, len(chunks))
+
+    elapsed = time.perf_counter() - started
+    timeline["stats"] = {
+        "chunks": len(chunks),
+        "workers": workers,
+        "frames_analysed": analysed,
+        "frames_with_pose": len(frames["frame"]),
+        "elapsed_s": round(elapsed, 3),
+        "fps_processed": round(analysed / elapsed, 1) if elapsed else None,
+        "realtime_factor": round((frame_count / fps) / elapsed, 2) if elapsed and fps else None,
+    }
+    return timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse a recorded Suryanamaskara video")
+    parser.add_argument("video", help="Path to the video file")
+    parser.add_argument("-o", "--output", help="Timeline JSON path (default: <video>.timeline.json)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--stride", type=int, default=1, help="Analyse every Nth frame")
+    parser.add_argument("--chunk-seconds", type=float, default=DEFAULT_CHUNK_SECONDS)
+    parser.add_argument("--warmup-frames", type=int, default=DEFAULT_WARMUP_FRAMES,
+                        help="Overlap frames used to warm up each worker's tracker")
+    parser.add_argument("--model-complexity", type=int, choices=[0, 1, 2], default=1)
+    args = parser.parse_args()
+    if args.stride < 1:
+        parser.error("--stride must be at least 1")
+    if args.chunk_seconds <= 0:
+        parser.error("--chunk-seconds must be positive")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    output = args.output or os.path.splitext(args.video)[0] + ".timeline.json"
+    timeline = analyze_video(
+        args.video, workers=args.workers, stride=args.stride,
+        chunk_seconds=args.chunk_seconds, warmup_frames=args.warmup_frames,
+        model_complexity=args.model_complexity,
+        progress=lambda done, total: print(f"✅ Chunk {done}/{total}")
+    )
+    with open(output, "w") as f:
+        json.dump(timeline, f, separators=(",", ":"))
+
+    stats = timeline["stats"]
+    print(f"\n🎯 Timeline saved to {output}")
+    print(f"📊 {stats['frames_analysed']} frames in {stats['elapsed_s']}s "
+          f"({stats['fps_processed']} fps, {stats['realtime_factor']}x real-time)")
+
+
+if __name__ == "__main__":
+    main()
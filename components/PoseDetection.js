@@ -42,6 +42,7 @@ const POSE_DESCRIPTIONS = {
 };
 
 const API_URL = 'http://localhost:5000';
+const DEFAULT_POLL_INTERVAL_MS = 500;
 
 export default function PoseDetection({ onBack, learnMode = false, targetPose = null }) {
   const videoRef = useRef(null);
@@ -54,6 +55,11 @@ export default function PoseDetection({ onBack, learnMode = false, targetPose =
   const [confidence, setConfidence] = useState(0);
   const streamRef = useRef(null);
   const predictionIntervalRef = useRef(null);
+  const pollIntervalRef = useRef(DEFAULT_POLL_INTERVAL_MS);
+  const sessionIdRef = useRef(null);
+  if (sessionIdRef.current === null) {
+    sessionIdRef.current = Math.random().toString(36).slice(2) + Date.now().toString(36);
+  }
 
   useEffect(() => {
     // Capture frame from video and send to API
@@ -80,10 +86,22 @@ export default function PoseDetection({ onBack, learnMode = false, targetPose =
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
+            'X-Session-Id': sessionIdRef.current,
           },
           body: JSON.stringify({ image: base64Image })
         });
 
+        // Follow the server's recommended polling interval (and back off when it sheds load)
+        const serverInterval = parseInt(response.headers.get('X-Poll-Interval-Ms'), 10);
+        if (!Number.isNaN(serverInterval)) {
+          pollIntervalRef.current = serverInterval;
+        }
+        if (response.status === 503) {
+          const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 1;
+          pollIntervalRef.current = Math.max(pollIntervalRef.current, retryAfter * 1000);
+          return;
+        }
+
         if (response.ok) {
           const data = await response.json();
           console.log('API Response:', data); // Debug log
@@ -182,10 +200,14 @@ export default function PoseDetection({ onBack, learnMode = false, targetPose =
           videoRef.current.onloadedmetadata = () => {
             setIsLoading(false);
             
-            // Start prediction loop
-            predictionIntervalRef.current = setInterval(() => {
-              captureAndPredict();
-            }, 500); // Predict every 500ms
+            // Start prediction loop: the next frame is sent only after the previous
+            // response arrived, spaced by the server-recommended interval
+            const predictLoop = async () => {
+              await captureAndPredict();
+              if (cancelled) return;
+              predictionIntervalRef.current = setTimeout(predictLoop, pollIntervalRef.current);
+            };
+            predictionIntervalRef.current = setTimeout(predictLoop, pollIntervalRef.current);
           };
         }
       } catch (error) {
@@ -195,14 +217,16 @@ export default function PoseDetection({ onBack, learnMode = false, targetPose =
       }
     };
 
+    let cancelled = false;
     initializeCamera();
 
     return () => {
+      cancelled = true;
       if (streamRef.current) {
         streamRef.current.getTracks().forEach(track => track.stop());
       }
       if (predictionIntervalRef.current) {
-        clearInterval(predictionIntervalRef.current);
+        clearTimeout(predictionIntervalRef.current);
       }
     };
   }, [currentPose, learnMode, targetPose]); // Re-run when currentPose, learnMode or targetPose changes